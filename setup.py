@@ -1,33 +1,39 @@
 from setuptools import setup, find_packages
 from setuptools.extension import Extension
-from Cython.Build import cythonize
 import os
 
-AMPTOOLS_HOME = os.environ["AMPTOOLS_HOME"]
-ROOT_HOME = os.environ["ROOTSYS"]
-
-amptools_extension = Extension(
-        name="FitResults",
-        sources=["/raid2/nhoffman/AmpPy/src/amppy/fitresults/FitResults.pyx"],
-        libraries=["AmpTools", "IUAmpTools", "MinuitInterface", "UpRootMinuit",
-            "Physics", "MathCore", "Matrix"],
-        library_dirs=["/home/nhoffman/env/gluex_top/AmpTools/AmpTools/lib", ROOT_HOME + "/lib"],
-        include_dirs=[AMPTOOLS_HOME + "/AmpTools/IUAmpTools", ROOT_HOME + "/include"],
-        language="c++")
+# the compiled FitResults/AmpTools extension is only built where AmpTools, halld_sim and ROOT are available,
+# everything else (including reading .fit files) works without it
+ext_modules = []
+if all([var in os.environ for var in ["AMPTOOLS_HOME", "ROOTSYS", "HALLD_SIM_HOME", "BMS_OSNAME"]]):
+    from Cython.Build import cythonize
+    AMPTOOLS_HOME = os.environ["AMPTOOLS_HOME"]
+    ROOT_HOME = os.environ["ROOTSYS"]
+    HALLD_SIM_HOME = os.environ["HALLD_SIM_HOME"]
+    BMS_OSNAME = os.environ["BMS_OSNAME"]
+    amptools_extension = Extension(
+            name="FitResults",
+            sources=["src/amppy/fitresults/FitResults.pyx"],
+            libraries=["AMPTOOLS_AMPS", "AMPTOOLS_DATAIO", "AmpTools", "IUAmpTools", "MinuitInterface", "UpRootMinuit",
+                "Physics", "MathCore", "Matrix", "Tree", "RIO", "Core"],
+            library_dirs=[AMPTOOLS_HOME + "/AmpTools/lib", HALLD_SIM_HOME + f"/{BMS_OSNAME}/lib", ROOT_HOME + "/lib"],
+            include_dirs=[AMPTOOLS_HOME + "/AmpTools/IUAmpTools", AMPTOOLS_HOME + "/AmpTools", HALLD_SIM_HOME + "/src/libraries", ROOT_HOME + "/include"],
+            language="c++")
+    ext_modules = cythonize(amptools_extension)
 
 setup(
     name="amppy",
     version="0.0.2",
     author="Nathaniel Dene Hoffman",
     author_email="dene@cmu.edu",
-    ext_modules=cythonize(amptools_extension),
+    ext_modules=ext_modules,
     packages=find_packages(
         where='src'
     ),
-    package_dir={"": "/raid2/nhoffman/AmpPy/src"},
-    scripts=["/raid2/nhoffman/AmpPy/src/amppy/scripts/sbatch_job.csh",
-             "/raid2/nhoffman/AmpPy/src/amppy/scripts/amppy_fit.py",
-             "/raid2/nhoffman/AmpPy/src/amppy/scripts/amppy"],
+    package_dir={"": "src"},
+    scripts=["src/amppy/scripts/sbatch_job.csh",
+             "src/amppy/scripts/amppy_fit.py",
+             "src/amppy/scripts/amppy"],
     install_requires=[
         'numpy',
         'cython',
@@ -35,6 +41,8 @@ setup(
         'simple_term_menu',
         'colorama',
         'pandas',
+        'pyarrow',
+        'uproot',
         'halo',
         'matplotlib'
     ],
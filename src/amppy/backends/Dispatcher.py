@@ -3,12 +3,24 @@ from pathlib import Path
 import numpy as np
 import enlighten
 import threading
+import queue
 from enum import Enum
 import os
 from itertools import combinations
 import pandas as pd
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from colorama import Fore, Style, init
 from halo import Halo
+from amppy.backends.Ledger import Ledger, get_ledger_path
+from amppy.backends.NormInt import prepare_normints
+from amppy.configs import load_config
+from amppy.dividers.BinInfo import BinInfo, get_bin_info_path
+from amppy.fitresults.Extraction import ExtractionSpec, get_spec_path, load_spec, run_extraction
+from amppy.fitresults.Covariance import get_covariance_path, gather_covariance
+from amppy.fitresults.ResultsStore import get_results_path, parse_results_lines, write_results, read_results
 
 class FitStatus(Enum):
     FAILED = 0
@@ -42,6 +54,7 @@ class Dispatcher(ABC):
         self._root_directory = None
         self._config_template = None
         self._n_bins = None
+        self.bin_info = None
         self._iterations = None
         self._reaction = None
         self._seed = None
@@ -52,6 +65,11 @@ class Dispatcher(ABC):
         self.total_counter = None
         self.bin_counters = None
         self._verbosity = None
+        self.completion_queue = None # set by backends which can report finished fits directly
+        self.ledger = None
+        self.skipped_bins = set() # bins which are not submitted (and not counted) at all
+        self.normint_processes = os.cpu_count()
+        self.shared_normints = True # fits read integrals precomputed once per bin when they are current
 
     @property
     def root_directory(self):
@@ -61,8 +79,8 @@ class Dispatcher(ABC):
     def root_directory(self, path):
         if path.is_dir():
             self._root_directory = path
-            bin_numbers, _ = self.get_bin_info()
-            self.n_bins = len(bin_numbers)
+            self.bin_info = BinInfo.read(get_bin_info_path(path))
+            self.n_bins = self.bin_info.n_bins
         else:
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
 
@@ -75,12 +93,7 @@ class Dispatcher(ABC):
     def config_template(self, path):
         if path.is_file():
             self._config_template = path
-            self._reaction = "reaction not found"
-            with open(path, 'r') as temp:
-                lines = temp.readlines()
-                for line in lines:
-                    if line.startswith("reaction"):
-                        self._reaction = line.split()[1]
+            self._reaction = load_config(path).reaction or "reaction not found"
             print(f"Reaction Name: {self.reaction}")
         else:
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
@@ -94,19 +107,6 @@ class Dispatcher(ABC):
         assert n > 0, "Must have a positive number of bins"
         self._n_bins = n
 
-    def get_bin_info(self):
-        with open(self.root_directory / "bin_info.txt") as reader:
-            lines = reader.readlines()
-            bin_numbers = []
-            bin_edges = []
-            for line in lines[1:]:
-                line = line.strip()
-                bin_number, bin_edge = line.split("\t")
-                bin_numbers += [bin_number]
-                bin_edges += [bin_edge]
-        return bin_numbers, bin_edges
-
-
     @property
     def bin_dirs(self):
         return [self.root_directory / str(n) for n in range(self.n_bins)]
@@ -184,43 +184,61 @@ class Dispatcher(ABC):
         bootstrap_file = (self.bin_dirs[bin_n] / str(iteration) / f"{self.config_template.stem}_{bin_n}_bootstrap::fit_results.txt").resolve()
         return fit_file, bootstrap_file
 
+    def get_covariance_file(self, bin_n, iteration):
+        return (self.bin_dirs[bin_n] / str(iteration) / f"{self.get_bin_config(bin_n).stem}::covariance.npz").resolve()
+
     def get_fit_files(self, bin_n, iteration):
         fit_files = sorted(list((self.bin_dirs[bin_n] / str(iteration)).resolve().glob(f"{self.config_template.stem}_{bin_n}*.fit")), key=os.path.getmtime)
         bootstrap_files = sorted(list((self.bin_dirs[bin_n] / str(iteration)).resolve().glob(f"{self.config_template.stem}_{bin_n}_bootstrap*.fit")), key=os.path.getmtime)
         return fit_files, bootstrap_files
 
     def is_fit(self, bin_n, iteration):
-        fit_files, bootstrap_files = self.get_fit_files(bin_n, iteration)
-        if self.bootstrap:
-            return bool(bootstrap_files)
-        else:
-            return bool(fit_files)
+        return self.ledger.get_status(bin_n, iteration, self.bootstrap) != None
 
 
     def remove_fit(self, bin_n, iteration):
         fit_file, bootstrap_file = self.get_fit_results_files(bin_n, iteration)
         fit_amptools_files, bootstrap_amptools_files = self.get_fit_files(bin_n, iteration)
-        if self.is_fit(bin_n, iteration):
-            if not self.bootstrap:
+        if not self.bootstrap:
+            if fit_file.exists():
                 fit_file.unlink()
-                if fit_amptools_files:
-                    for f in fit_amptools_files:
-                        if f.exists():
-                            f.unlink()
-            if bootstrap_file.exists():
-                bootstrap_file.unlink()
-            if bootstrap_amptools_files:
-                for f in bootstrap_amptools_files:
+            if fit_amptools_files:
+                for f in fit_amptools_files:
                     if f.exists():
                         f.unlink()
+        if bootstrap_file.exists():
+            bootstrap_file.unlink()
+        if bootstrap_amptools_files:
+            for f in bootstrap_amptools_files:
+                if f.exists():
+                    f.unlink()
+        for tag in ([""] if not self.bootstrap else []) + ["_bootstrap"]:
+            (self.bin_dirs[bin_n] / str(iteration) / f"{self.config_template.stem}_{bin_n}{tag}::covariance.npz").unlink(missing_ok=True)
+        self.ledger.remove(bin_n, iteration, self.bootstrap)
+        if not self.bootstrap:
+            self.ledger.remove(bin_n, iteration, True)
 
     def remove_fits(self):
+        statuses = self.ledger.get_statuses(self.bootstrap)
         for bin_n in range(self.n_bins):
             for iteration in range(self.iterations):
+                if (bin_n, iteration) in statuses:
+                    self.remove_fit(bin_n, iteration)
+
+    def remove_failed_fits(self):
+        # failed fits are forgotten so the next dispatch retries them
+        for bin_n, iteration in self.ledger.get_jobs_with_status(self.bootstrap, ["FAILED", "UNKNOWN"]):
+            if bin_n < self.n_bins and iteration < self.iterations:
                 self.remove_fit(bin_n, iteration)
 
 
     def get_fit_status(self, bin_n, iteration):
+        status = self.ledger.get_status(bin_n, iteration, self.bootstrap)
+        if status == None:
+            return FitStatus.NO_FIT
+        return FitStatus[status]
+
+    def get_fit_status_from_files(self, bin_n, iteration):
         fit_files, bootstrap_files = self.get_fit_files(bin_n, iteration)
         if self.bootstrap:
             if not bootstrap_files:
@@ -237,11 +255,68 @@ class Dispatcher(ABC):
         elif "CALL_LIMIT" in fit_file.name:
             return FitStatus.CALL_LIMIT
         else:
-            return Fitstatus.UNKNOWN
+            return FitStatus.UNKNOWN
 
 
     def get_active_jobs(self):
-        return [[not self.is_fit(n, iteration) for iteration in range(self.iterations)] for n in range(self.n_bins)]
+        statuses = self.ledger.get_statuses(self.bootstrap)
+        return [[(n, iteration) not in statuses and n not in self.skipped_bins for iteration in range(self.iterations)] for n in range(self.n_bins)]
+
+
+    def get_bin_events(self, bin_n):
+        # number of events in the binned data/accepted MC/generated MC flat trees, read from the tree headers only
+        import uproot # only needed here, so backends don't import it just to be loaded
+        events = {"DATA": 0, "ACCEPT": 0, "GEN": 0}
+        for tag in events:
+            for root_file in self.bin_dirs[bin_n].glob(f"*_{tag}__{bin_n}.root"):
+                with uproot.open(str(root_file)) as tfile:
+                    events[tag] += tfile["kin"].num_entries
+        return events
+
+    def get_bin_costs(self, min_events=1):
+        # relative cost of one fit in each bin, bins with fewer than min_events data events are skipped
+        costs = {}
+        self.skipped_bins = set()
+        for bin_n in range(self.n_bins):
+            events = self.get_bin_events(bin_n)
+            if events["DATA"] < min_events:
+                self.skipped_bins.add(bin_n)
+            costs[bin_n] = events["DATA"] + events["ACCEPT"] + events["GEN"]
+        if self.skipped_bins:
+            print(f"Skipping bin(s) with fewer than {min_events} data event(s): {', '.join(map(str, sorted(self.skipped_bins)))}")
+        return costs
+
+
+    def get_bin_config(self, bin_n):
+        tag = "_bootstrap" if self.bootstrap else ""
+        return self.bin_dirs[bin_n] / f"{self.config_template.stem}_{bin_n}{tag}.cfg"
+
+    def prepare_normints(self):
+        # integrate the MC of every bin with outstanding fits once, the fits then read the shared integrals
+        active_jobs = self.get_active_jobs()
+        bin_configs = [self.get_bin_config(bin_n) for bin_n in range(self.n_bins) if np.any(active_jobs[bin_n])]
+        if not bin_configs:
+            return
+        spinner = Halo(text='Computing normalization integrals', spinner='dots')
+        spinner.start()
+        with Pool(processes=min(self.normint_processes, len(bin_configs))) as pool:
+            shared = pool.map(run_prepare_normints, bin_configs)
+        spinner.succeed(f"Normalization integrals shared in {sum(shared)}/{len(bin_configs)} bin(s)")
+
+
+    def sync_ledger(self):
+        # one-time import of fits made before this directory had a ledger
+        for bin_n in range(self.n_bins):
+            for iteration in range(self.iterations):
+                fit_status = self.get_fit_status_from_files(bin_n, iteration)
+                if fit_status != FitStatus.NO_FIT:
+                    self.ledger.finish(bin_n, iteration, self.bootstrap, fit_status.name)
+
+    def load_ledger(self):
+        self.ledger = Ledger(get_ledger_path(self.config_template))
+        if not self.ledger.has_jobs(self.bootstrap):
+            self.sync_ledger()
+        self.ledger.register([(bin_n, iteration, self.get_seed(iteration)) for bin_n in range(self.n_bins) for iteration in range(self.iterations)], self.bootstrap)
 
 
     def preprocessing(self, **kwargs):
@@ -257,6 +332,7 @@ class Dispatcher(ABC):
         self.seed = seed
         self.bootstrap = bootstrap
         self.verbosity = verbosity
+        self.load_ledger()
 
     def create_counters(self):
         active_jobs = self.get_active_jobs() # list of True if not fit
@@ -273,83 +349,160 @@ class Dispatcher(ABC):
     def update_status(self):
         pass
 
+    def notify_completion(self, bin_n, iteration, fit_status):
+        if self.completion_queue != None:
+            self.completion_queue.put((bin_n, iteration, fit_status))
+
+    def count_fit(self, bin_n, iteration, fit_status):
+        print(f"Bin {bin_n} iteration {iteration} fit: {fit_status} ({self.config_template.stem})")
+        if self.bin_counters != None:
+            self.bin_counters[bin_n].update(fit_status)
+        if self.total_counter != None:
+            self.total_counter.update(fit_status)
+
     def update_counters(self):
+        if self.completion_queue != None:
+            self.update_counters_from_queue()
+        else:
+            self.update_counters_from_ledger()
+
+    def update_counters_from_queue(self):
+        # O(1) per finished fit: backends push (bin, iteration, status) as fits complete
+        active_jobs = self.get_active_jobs()
+        n_remaining = int(np.sum(active_jobs))
+        while n_remaining != 0:
+            try:
+                bin_n, iteration, fit_status = self.completion_queue.get(timeout=1)
+            except queue.Empty:
+                self.update_status()
+                continue
+            if active_jobs[bin_n][iteration]:
+                active_jobs[bin_n][iteration] = False
+                n_remaining -= 1
+                self.count_fit(bin_n, iteration, fit_status)
+            self.update_status()
+
+    def update_counters_from_ledger(self):
         active_jobs = self.get_active_jobs()
         active_indices = np.argwhere(active_jobs)
         while len(active_indices) != 0:
+            statuses = self.ledger.get_statuses(self.bootstrap) # one query per pass
             for ind in active_indices:
                 bin_n = ind[0]
                 iteration = ind[1]
-                fit_status = self.get_fit_status(bin_n, iteration)
-                if fit_status != FitStatus.NO_FIT:
+                status = statuses.get((bin_n, iteration))
+                if status != None:
                     active_jobs[bin_n][iteration] = False
-                    print(f"Bin {bin_n} iteration {iteration} fit: {fit_status} ({self.config_template.stem})")
-                    if self.bin_counters != None:
-                        self.bin_counters[bin_n].update(fit_status)
-                    if self.total_counter != None:
-                        self.total_counter.update(fit_status)
-                    active_indices = np.argwhere(active_jobs)
+                    self.count_fit(bin_n, iteration, FitStatus[status])
+            active_indices = np.argwhere(active_jobs)
             self.update_status()
 
 
-    def gather(self):
-        amplitudes = []
-        with open(self.config_template, 'r') as cfg:
-            for line in cfg.readlines():
-                if line.startswith("amplitude"):
-                    amplitudes.append(line.split()[1].strip())
-        headers = []
-        for wave_name in amplitudes:
-            wave_parts = wave_name.split("::")
-            if wave_parts[1].endswith("Re"):
-                headers.append(wave_parts[2] + "_NC_INT")
-                headers.append(wave_parts[2] + "_NC_INT_err")
-                headers.append(wave_parts[2] + "_AC_INT")
-                headers.append(wave_parts[2] + "_AC_INT_err")
-        for wave_name in amplitudes:
-            wave_parts = wave_name.split("::")
-            if wave_parts[1].endswith("Re"):
-                headers.append(wave_parts[2] + "_AMP")
-        wave_pairs = combinations(amplitudes, 2)
-        for wave_pair in wave_pairs:
-            wave_name1, wave_name2 = wave_pair
-            wave_parts1 = wave_name1.split("::")
-            wave_parts2 = wave_name2.split("::")
-            if wave_parts1[1].endswith("Re") and wave_parts2[1].endswith("Re"):
-                if wave_parts1[1] == wave_parts2[1]:
-                    headers.append(wave_parts1[2] + "_" + wave_parts2[2] + "_PHASE")  
-                    headers.append(wave_parts1[2] + "_" + wave_parts2[2] + "_PHASE_err")  
-        headers.append("total_NC_INT")
-        headers.append("total_NC_INT_err")
-        headers.append("total_AC_INT")
-        headers.append("total_AC_INT_err")
-        headers.append("likelihood")
-        if self.bootstrap:
-            output_file_name = self.config_template.stem + "_bootstrap::fit_results.txt"
+    def get_headers(self):
+        return load_spec(self.config_template).headers()
+
+    def extract(self, spec=None, processes=None):
+        """
+        Rebuild every finished fit's results file from its .fit file, without refitting.
+
+        The columns of spec are added to the default ones and used for all later fits and gathers.
+        """
+        full_spec = ExtractionSpec.from_config(self.config_template)
+        if spec != None:
+            full_spec = full_spec.extend(spec)
+        # an unknown wave raises here, before the spec is saved for later fits and before any results file is touched
+        template = load_config(self.config_template)
+        full_spec.requests(template.amplitudes, template.polarizations)
+        # a fit which fails to extract only keeps its old line if the columns didn't change
+        drop_stale = full_spec.headers() != load_spec(self.config_template).headers()
+        full_spec.to_json(get_spec_path(self.config_template))
+        input_tups = []
+        for (bin_n, iteration), status in self.ledger.get_statuses(self.bootstrap).items():
+            if status not in ("CONVERGED", "CALL_LIMIT") or bin_n >= self.n_bins or iteration >= self.iterations:
+                continue
+            bin_config = self.get_bin_config(bin_n)
+            fit_file = self.bin_dirs[bin_n] / str(iteration) / f"{bin_config.stem}::{self.reaction}::{status}.fit"
+            fit_results, bootstrap_results = self.get_fit_results_files(bin_n, iteration)
+            input_tups.append((full_spec, fit_file, bin_config, bootstrap_results if self.bootstrap else fit_results,
+                               self.get_covariance_file(bin_n, iteration), bin_n, iteration, "C" if status == "CONVERGED" else "L", drop_stale))
+        spinner = Halo(text='Extracting Results', spinner='dots')
+        spinner.start()
+        with Pool(processes=processes) as pool:
+            extracted = sum(pool.imap_unordered(run_extraction, input_tups))
+        if extracted < len(input_tups) and drop_stale:
+            spinner.warn(f"Extracted results from {extracted}/{len(input_tups)} fit(s), the others are left out of the results until they are extracted again")
         else:
-            output_file_name = self.config_template.stem + "::fit_results.txt"
-        with open(self.root_directory / output_file_name, 'w') as out_file:
-            header = "\t".join(headers)
-            out_file.write(f"Bin\tIteration\tConvergence\t{header}\n")
-            bin_converged_total = np.zeros_like(self.bin_dirs)
-            bin_total = np.ones_like(self.bin_dirs) * self.iterations
-            spinner = Halo(text='Gathering Results', spinner='dots')
-            spinner.start()
-            for bin_n in range(self.n_bins):
-                for iteration in range(self.iterations):
-                    fit_results, bootstrap_results = self.get_fit_results_files(bin_n, iteration)
-                    if self.bootstrap:
-                        fit_results = bootstrap_results
-                    converged = "U"
-                    if fit_results.exists():
-                        with open(fit_results, 'r') as fit_res:
-                            line = fit_res.readline()
-                            if line != "":
-                                converged = line.split('\t')[2].strip()
-                                out_file.write(line)
-                        if converged == "C":
-                            bin_converged_total[bin_n] += 1
-            spinner.succeed()
+            spinner.succeed(f"Extracted results from {extracted}/{len(input_tups)} fit(s)")
+
+    def get_gather_manifest_path(self):
+        tag = "_bootstrap" if self.bootstrap else ""
+        return self.root_directory / f"{self.config_template.stem}{tag}::gather_manifest.json"
+
+    def load_gather_manifest(self, headers):
+        # {"bin/iteration": [mtime_ns, size, line]} from the previous gather, empty if the headers changed
+        manifest_path = self.get_gather_manifest_path()
+        if not manifest_path.exists() or not get_results_path(self.config_template, self.bootstrap).exists():
+            return {}
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("headers") != headers:
+            return {}
+        return manifest.get("files", {})
+
+    def gather(self, tsv=False, threads=16):
+        # only result files which are new or changed since the last gather are read, the output
+        # is rebuilt from every line in the same (bin, iteration) order as a full gather
+        headers = self.get_headers()
+        previous = self.load_gather_manifest(headers)
+        keys = []
+        paths = []
+        for bin_n in range(self.n_bins):
+            for iteration in range(self.iterations):
+                fit_results, bootstrap_results = self.get_fit_results_files(bin_n, iteration)
+                keys.append((bin_n, iteration))
+                paths.append(bootstrap_results if self.bootstrap else fit_results)
+        spinner = Halo(text='Gathering Results', spinner='dots')
+        spinner.start()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            entries = list(executor.map(read_fit_results_file, paths, [previous.get(f"{b}/{i}") for b, i in keys]))
+        lines = []
+        new_lines = []
+        unchanged_keys = []
+        files = {}
+        bin_converged_total = np.zeros_like(self.bin_dirs)
+        bin_total = np.ones_like(self.bin_dirs) * self.iterations
+        for (bin_n, iteration), entry in zip(keys, entries):
+            if entry == None:
+                continue
+            files[f"{bin_n}/{iteration}"] = entry
+            line = entry[2]
+            if previous.get(f"{bin_n}/{iteration}") == entry:
+                unchanged_keys.append((bin_n, iteration))
+            elif line != "":
+                new_lines.append(line)
+            if line != "":
+                lines.append(line)
+                if line.split('\t')[2].strip() == "C":
+                    bin_converged_total[bin_n] += 1
+        df = parse_results_lines(new_lines, headers)
+        if unchanged_keys:
+            old_df = read_results(self.config_template, self.bootstrap)
+            old_df = old_df[pd.MultiIndex.from_frame(old_df[['Bin', 'Iteration']]).isin(unchanged_keys)]
+            df = pd.concat([old_df, df]).sort_values(['Bin', 'Iteration'], kind='stable').reset_index(drop=True)
+            df = df.astype({"Bin": 'int32', "Iteration": 'int32', "Convergence": 'category'})
+        write_results(df, get_results_path(self.config_template, self.bootstrap))
+        covariance_keys = [(bin_n, iteration) for bin_n, iteration in zip(df['Bin'], df['Iteration']) if self.get_covariance_file(bin_n, iteration).exists()]
+        gather_covariance([self.get_covariance_file(bin_n, iteration) for bin_n, iteration in covariance_keys],
+                          [bin_n for bin_n, _ in covariance_keys], [iteration for _, iteration in covariance_keys],
+                          get_covariance_path(self.config_template, self.bootstrap))
+        with open(self.get_gather_manifest_path(), 'w') as manifest_file:
+            json.dump({"headers": headers, "files": files}, manifest_file)
+        if tsv:
+            with open(get_results_path(self.config_template, self.bootstrap, ".txt"), 'w') as out_file:
+                header = "\t".join(headers)
+                out_file.write(f"Bin\tIteration\tConvergence\t{header}\n")
+                out_file.writelines(lines)
+        spinner.succeed(f"Gathered Results ({len(files) - len(unchanged_keys)} new or changed fit(s))")
         print("Convergence Results:")
         for bin_n in range(self.n_bins):
             percent_converged = bin_converged_total[bin_n] / bin_total[bin_n]
@@ -366,35 +519,33 @@ class Dispatcher(ABC):
 
     
     def bootstrap_config(self):
-        df = pd.read_csv(self.root_directory / f"{self.config_template.stem}::fit_results.txt",
-                         delimiter="\t",
-                         index_col=False)
+        amp_columns = [col + tag for col in self.get_headers() if col.endswith("_AMP") for tag in ["_re", "_im"]]
+        df = read_results(self.config_template, columns=['Bin', 'likelihood'] + amp_columns)
         best_fit = df.loc[df.groupby(['Bin'])['likelihood'].idxmax()].set_index('Bin')
         for bin_n in range(self.n_bins):
             bin_config = self.bin_dirs[bin_n] / f"{self.config_template.stem}_{bin_n}.cfg"
             bin_config_dest = self.bin_dirs[bin_n] / f"{self.config_template.stem}_{bin_n}_bootstrap.cfg"
-            with open(bin_config, 'r') as config_old:
-                config_old_lines = config_old.readlines()
+            best_values = best_fit.iloc[bin_n]
+            def transform(line_parts):
+                # resample the data and start every amplitude at the best fit
+                if line_parts[:1] == ["data"] and "ROOTDataReader" in line_parts and "LOOPDATAFILE" in line_parts:
+                    return [("ROOTDataReaderBootstrap" if part == "ROOTDataReader" else part) for part in line_parts] + ["@seed"]
+                if line_parts[:1] == ["initialize"]:
+                    wave_name = line_parts[1].split("::")[2]
+                    return (line_parts[:2] + ["cartesian", str(best_values[wave_name + "_AMP_re"]), str(best_values[wave_name + "_AMP_im"])] +
+                            line_parts[5:])
+                return None
             with open(bin_config_dest, 'w') as config_bootstrap:
-                for line in config_old_lines:
-                    if "ROOTDataReader LOOPDATAFILE" in line:
-                        line = line.replace("ROOTDataReader", "ROOTDataReaderBootstrap")
-                        line = line.replace("\n", " @seed\n")
-                    if line.startswith("initialize"):
-                        line = line.replace("polar", "cartesian")
-                        wave_name = line.split(" ")[1].split("::")[2]
-                        fields = line.split(" ")
-                        fields[3] = str(complex(best_fit.iloc[bin_n][wave_name + "_AMP"]).real)
-                        fields[4] = str(complex(best_fit.iloc[bin_n][wave_name + "_AMP"]).imag)
-                        line = " ".join(fields)
-                        line += "\n"
-                    config_bootstrap.write(line)
+                config_bootstrap.writelines(load_config(bin_config).render(lambda line_parts, position: line_parts[position], transform))
 
 
     def dispatch(self, **kwargs):
         self.preprocessing(**kwargs)
         if self.bootstrap:
             self.bootstrap_config()
+        self.shared_normints = not kwargs.get("no_shared_normints", False)
+        if self.shared_normints:
+            self.prepare_normints()
         if self.verbosity > 0:
             self.create_counters()
             counters = threading.Thread(target=update_counter_thread, args=(self,))
@@ -404,11 +555,34 @@ class Dispatcher(ABC):
             self.postprocessing(**kwargs)
             counters.join()
             self.bar_manager.stop()
-            self.gather()
+            self.gather(tsv=kwargs.get("tsv", False))
         else:
             self.submit_jobs()
             self.postprocessing(**kwargs)
-            self.gather()
+            self.gather(tsv=kwargs.get("tsv", False))
+
+
+def read_fit_results_file(path, previous_entry):
+    # returns [mtime_ns, size, first line] or None if the file does not exist,
+    # the file is only opened if it changed since previous_entry was recorded
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if previous_entry != None and previous_entry[0] == stat.st_mtime_ns and previous_entry[1] == stat.st_size:
+        return previous_entry
+    with open(path, 'r') as fit_res:
+        line = fit_res.readline()
+    return [stat.st_mtime_ns, stat.st_size, line]
+
+
+def run_prepare_normints(bin_config):
+    # a bin whose integrals can't be computed up front is still fit, each fit integrates the MC itself
+    try:
+        return prepare_normints(bin_config)
+    except Exception:
+        traceback.print_exc()
+        return False
 
 
 def update_counter_thread(disp):
@@ -3,11 +3,32 @@ import errno
 import sys
 import os
 import subprocess
+import traceback
 from amppy.fitresults import FitResults
-from itertools import combinations
+from amppy.fitresults.Extraction import load_spec, write_fit_results
+from amppy.fitresults.Covariance import write_covariance
+from amppy.fitresults.FitFile import open_fit_file
+from amppy.backends.Ledger import Ledger, get_ledger_path
+from amppy.backends.NormInt import normints_are_current, use_shared_normints
+from amppy.configs import load_config
 from pathlib import Path
 
+def get_migrad_status(minuit_status, ematrix_status, n_calls, max_calls):
+    """
+    The STATUS=... label Minuit prints after MIGRAD, which fit reports, from its return codes.
+
+    MIGRAD returns 4 both when it runs out of calls and when it fails (no improvement found, covariance
+    not positive definite), only the number of calls used tells the two apart. A converged MIGRAD
+    always leaves an error matrix, without one (status 0) the fit is not trusted.
+    """
+    if minuit_status == 0 and ematrix_status > 0:
+        return "CONVERGED"
+    if minuit_status == 4 and n_calls >= max_calls:
+        return "CALL_LIMIT"
+    return "FAILED"
+
 class Fitter():
+    max_calls = 5000 # MIGRAD call limit of in-process fits
     
     def __init__(self):
         self._seed = None
@@ -19,6 +40,9 @@ class Fitter():
         self._bootstrap = None
         self._bin_directory = None
         self._iteration_directory = None
+        self.ledger = None
+        self.spec = None
+        self.shared_normints = True
         
 
     @property
@@ -111,36 +135,33 @@ class Fitter():
         self._iteration_directory = path
 
 
+    def draw_tag(self, line_parts, position):
+        # random values for the @tags of a bin config, drawn in file order so a seed always gives the same config
+        tag = line_parts[position]
+        if tag == '@seed':
+            return str(np.random.randint(1, high=100000))
+        if tag == '@uniform' and line_parts[0] == 'initialize' and position in (3, 4):
+            if line_parts[2] == 'cartesian':
+                return str(np.random.uniform(low=-100.0, high=100.0))
+            elif line_parts[2] == 'polar':
+                if position == 3:
+                    return str(np.random.uniform(low=0.0, high=100.0))
+                return str(np.random.uniform(low=0.0, high=2 * np.pi))
+        return tag
+
     def create_config(self):
-        with open(self.config_template, 'r') as config_temp:
-            temp_lines = config_temp.readlines()
+        template = load_config(self.config_template)
         new_config_path = self.iteration_directory / (self.config_template.stem + f"-{self.iteration}.cfg")
+        transform = None
+        if self.shared_normints and normints_are_current(self.config_template):
+            # read the bin's precomputed integrals rather than integrating the MC again
+            transform = use_shared_normints(template)
         with open(new_config_path, 'w') as new_config:
-            output_lines = []
-            for line in temp_lines:
-                if '@seed' in line:
-                    bootstrap_seed = str(np.random.randint(1, high=100000))
-                    line = line.replace('@seed', bootstrap_seed)
-                if line.startswith('initialize'):
-                    line_parts = line.split()
-                    if line_parts[2] == 'cartesian':
-                        if line_parts[3] == '@uniform':
-                            line_parts[3] = str(np.random.uniform(low=-100.0, high=100.0))
-                        if line_parts[4] == '@uniform':
-                            line_parts[4] = str(np.random.uniform(low=-100.0, high=100.0))
-                    elif line_parts[2] == 'polar':
-                        if line_parts[3] == '@uniform':
-                            line_parts[3] = str(np.random.uniform(low=0.0, high=100.0))
-                        if line_parts[4] == '@uniform':
-                            line_parts[4] = str(np.random.uniform(low=0.0, high=2 * np.pi))
-                    line = " ".join(line_parts)
-                    line += "\n"
-                output_lines.append(line)
-            new_config.writelines(output_lines)
+            new_config.writelines(template.render(self.draw_tag, transform))
         self.config = new_config_path
 
 
-    def setup(self, bin_directory: Path, bin_number: int, iteration: int, seed: int, reaction: str, bootstrap: bool, config_template: Path):
+    def setup(self, bin_directory: Path, bin_number: int, iteration: int, seed: int, reaction: str, bootstrap: bool, config_template: Path, shared_normints=True):
         self.bin_number = bin_number
         self.iteration = iteration
         self.seed = seed # sets seed
@@ -148,10 +169,14 @@ class Fitter():
         self.bootstrap = bootstrap
         self.bin_directory = bin_directory
         self.config_template = config_template
+        self.ledger = Ledger(get_ledger_path(config_template))
+        self.spec = load_spec(config_template) # before config_template is replaced by the bin's config
+        self.shared_normints = shared_normints
         self.iteration_directory = self.bin_directory / str(iteration)
         self.create_config()
 
     def fit(self):
+        self.ledger.start(self.bin_number, self.iteration, self.bootstrap, self.seed)
         os.chdir(self.iteration_directory)
         process = subprocess.run(['fit', '-c', str(self.config)],
                                  stdout=subprocess.PIPE,
@@ -159,60 +184,52 @@ class Fitter():
         fit_result = process.stdout
         if "STATUS=CONVERGED" in fit_result:
             status = "CONVERGED"
-            convergence = "C"
         elif "STATUS=FAILED" in fit_result:
             status = "FAILED"
-            convergence = "F"
         elif "STATUS=CALL LIMIT" in fit_result:
             status = "CALL_LIMIT"
-            convergence = "L"
         else:
             status = "UNKNOWN"
-            convergence = "U"
+        return self.write_results(status)
+
+    def fit_with(self, amptools_fitter):
+        # same as fit, but minimizes with an AmpToolsFitterWrapper which already holds this bin's data
+        self.ledger.start(self.bin_number, self.iteration, self.bootstrap, self.seed)
+        os.chdir(self.iteration_directory)
+        minuit_status, ematrix_status, n_calls = amptools_fitter.fit(load_config(self.config).get_starting_values(), self.max_calls)
+        return self.write_results(get_migrad_status(minuit_status, ematrix_status, n_calls, self.max_calls))
+
+    def write_results(self, status):
+        convergence = {"CONVERGED": "C", "FAILED": "F", "CALL_LIMIT": "L"}.get(status, "U")
         fit_output_source = Path(self.reaction + ".fit").resolve()
         fit_output_destination = Path(self.config_template.stem +
                                       "::" + fit_output_source.stem +
                                       f"::{status}.fit").resolve()
         fit_output_source.replace(fit_output_destination)
-        amplitudes = []
-        polarizations = []
-        with open(self.config, 'r') as cfg:
-            for line in cfg.readlines():
-                if line.startswith("amplitude"):
-                    amplitudes.append(line.split()[1].strip())
-                if line.startswith("define polAngle"):
-                    polarizations.append(line.split()[1].replace("polAngle", ""))
-        data_output_list = []
-        wrapper = FitResults.FitResultsWrapper(str(fit_output_destination))
-        for wave_name in amplitudes:
-            waves = []
-            wave_parts = wave_name.split("::")
-            if wave_parts[1].endswith("Re"):
-                for pol in polarizations:
-                    waves.append(wave_parts[0] + pol + "::" + wave_parts[1] + "::" + wave_parts[2])
-                    waves.append(wave_parts[0] + pol + "::" + wave_parts[1].replace("Re", "Im") + "::" + wave_parts[2])
-                data_output_list.extend(wrapper.intensity(waves, False))
-                data_output_list.extend(wrapper.intensity(waves, True))
-        for wave_name in amplitudes:
-            wave_parts = wave_name.split("::")
-            if wave_parts[1].endswith("Re"):
-                wave = wave_parts[0] + polarizations[0] + "::" + wave_parts[1] + "::" + wave_parts[2]
-                data_output_list.append(wrapper.productionParameter(wave))
-        wave_pairs = combinations(amplitudes, 2)
-        for wave_pair in wave_pairs:
-            wave_name1, wave_name2 = wave_pair
-            wave_parts1 = wave_name1.split("::")
-            wave_parts2 = wave_name2.split("::")
-            if wave_parts1[1].endswith("Re") and wave_parts2[1].endswith("Re"):
-                if wave_parts1[1] == wave_parts2[1]:
-                    wave1 = wave_parts1[0] + polarizations[0] + "::" + wave_parts1[1] + "::" + wave_parts1[2]
-                    wave2 = wave_parts2[0] + polarizations[0] + "::" + wave_parts2[1] + "::" + wave_parts2[2]
-                    data_output_list.extend(wrapper.phaseDiff(wave1, wave2))
-        data_output_list.extend(wrapper.total_intensity(False))
-        data_output_list.extend(wrapper.total_intensity(True))
-        data_output_list.append(wrapper.likelihood())
-        output_file_name = self.config_template.stem + "::fit_results.txt"
-        with open(output_file_name, 'w') as out_file:
-            if convergence == 'C' or convergence == 'L':
-                output = "\t".join([str(itm) for itm in data_output_list])
-                out_file.write(f"{self.bin_number}\t{self.iteration}\t{convergence}\t{output}\n")
+        values = []
+        fit = None
+        if convergence == 'C' or convergence == 'L':
+            fit = open_fit_file(fit_output_destination, self.config)
+            values = self.spec.extract(fit, self.config)
+        write_fit_results(self.config_template.stem + "::fit_results.txt", self.bin_number, self.iteration, convergence, values)
+        if fit != None:
+            try:
+                write_covariance(fit, self.config_template.stem + "::covariance.npz")
+            except Exception:
+                # the results line is already written, a missing covariance only leaves this fit out of the stacked file
+                traceback.print_exc()
+        self.ledger.finish(self.bin_number, self.iteration, self.bootstrap, status)
+        return status
+
+
+def fit_in_process(fitters):
+    """
+    Fit several iterations of one bin in this process, reading the bin's data and Monte Carlo once.
+
+    Each Fitter must already be set up, only the starting values differ between them.
+    Yields the status of each fit as it finishes.
+    """
+    os.chdir(fitters[0].iteration_directory) # file paths in the configs are relative to an iteration directory
+    amptools_fitter = FitResults.AmpToolsFitterWrapper(str(fitters[0].config))
+    for fitter in fitters:
+        yield fitter.fit_with(amptools_fitter)
@@ -0,0 +1,125 @@
+import sqlite3
+import socket
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+# lifecycle of a job in the ledger, the fit status (CONVERGED, CALL_LIMIT, FAILED, UNKNOWN)
+# is stored separately once a job is DONE
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+DONE = "DONE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    bin INTEGER NOT NULL,
+    iteration INTEGER NOT NULL,
+    bootstrap INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    status TEXT,
+    seed INTEGER,
+    host TEXT,
+    start_time REAL,
+    end_time REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bin, iteration, bootstrap)
+)
+"""
+
+def get_ledger_path(config_template):
+    config_template = Path(config_template)
+    return config_template.parent / f"{config_template.stem}::jobs.db"
+
+
+class Ledger():
+    """
+    On-disk record of every (bin, iteration) job for a single config file.
+
+    Connections are opened per operation so a Ledger can be shared between the counter
+    thread, forked pool workers and fits running on other cluster nodes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.connect() as con:
+            con.execute(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        with closing(sqlite3.connect(str(self.path), timeout=60)) as con:
+            with con: # commits on success, rolls back on error
+                yield con
+
+    def has_jobs(self, bootstrap):
+        with self.connect() as con:
+            row = con.execute("SELECT COUNT(*) FROM jobs WHERE bootstrap = ?", (int(bootstrap),)).fetchone()
+        return row[0] > 0
+
+    def register(self, jobs, bootstrap):
+        # jobs is an iterable of (bin, iteration, seed), seeds of unfinished jobs are updated
+        with self.connect() as con:
+            con.executemany("""INSERT INTO jobs (bin, iteration, bootstrap, state, seed) VALUES (?, ?, ?, ?, ?)
+                               ON CONFLICT (bin, iteration, bootstrap) DO UPDATE SET seed = excluded.seed
+                               WHERE jobs.state != ?""",
+                            [(int(b), int(i), int(bootstrap), PENDING, int(s), DONE) for b, i, s in jobs])
+
+    def start(self, bin_n, iteration, bootstrap, seed):
+        with self.connect() as con:
+            con.execute("""INSERT INTO jobs (bin, iteration, bootstrap, state, seed, host, start_time, attempts) VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+                           ON CONFLICT (bin, iteration, bootstrap) DO UPDATE SET state = excluded.state, status = NULL,
+                           seed = excluded.seed, host = excluded.host, start_time = excluded.start_time, end_time = NULL,
+                           attempts = jobs.attempts + 1""",
+                        (int(bin_n), int(iteration), int(bootstrap), RUNNING, int(seed), socket.gethostname(), time.time()))
+
+    def finish(self, bin_n, iteration, bootstrap, status):
+        with self.connect() as con:
+            con.execute("""INSERT INTO jobs (bin, iteration, bootstrap, state, status, end_time) VALUES (?, ?, ?, ?, ?, ?)
+                           ON CONFLICT (bin, iteration, bootstrap) DO UPDATE SET state = excluded.state,
+                           status = excluded.status, end_time = excluded.end_time""",
+                        (int(bin_n), int(iteration), int(bootstrap), DONE, status, time.time()))
+
+    def remove(self, bin_n, iteration, bootstrap):
+        with self.connect() as con:
+            con.execute("DELETE FROM jobs WHERE bin = ? AND iteration = ? AND bootstrap = ?",
+                        (int(bin_n), int(iteration), int(bootstrap)))
+
+    def get_status(self, bin_n, iteration, bootstrap):
+        # None if the job has not finished
+        with self.connect() as con:
+            row = con.execute("SELECT status FROM jobs WHERE bin = ? AND iteration = ? AND bootstrap = ? AND state = ?",
+                              (int(bin_n), int(iteration), int(bootstrap), DONE)).fetchone()
+        return None if row is None else row[0]
+
+    def get_statuses(self, bootstrap):
+        # {(bin, iteration): status} for every finished job, in a single query
+        with self.connect() as con:
+            rows = con.execute("SELECT bin, iteration, status FROM jobs WHERE bootstrap = ? AND state = ?",
+                               (int(bootstrap), DONE)).fetchall()
+        return {(b, i): status for b, i, status in rows}
+
+    def get_jobs_with_status(self, bootstrap, statuses):
+        marks = ", ".join("?" * len(statuses))
+        with self.connect() as con:
+            rows = con.execute(f"SELECT bin, iteration FROM jobs WHERE bootstrap = ? AND state = ? AND status IN ({marks})",
+                               (int(bootstrap), DONE, *statuses)).fetchall()
+        return rows
+
+    def get_iteration_count(self, bootstrap):
+        # number of iterations registered per bin, 0 for a config which was never dispatched
+        with self.connect() as con:
+            row = con.execute("SELECT MAX(iteration) FROM jobs WHERE bootstrap = ?", (int(bootstrap),)).fetchone()
+        return 0 if row[0] == None else row[0] + 1
+
+    def get_mean_fit_time(self, bootstrap):
+        # mean wall time in seconds of finished fits, None if nothing has finished yet
+        with self.connect() as con:
+            row = con.execute("SELECT AVG(end_time - start_time) FROM jobs WHERE bootstrap = ? AND state = ? AND start_time IS NOT NULL",
+                              (int(bootstrap), DONE)).fetchone()
+        return row[0]
+
+    def summary(self):
+        # [(bootstrap, state, status, count, mean fit time in seconds)]
+        with self.connect() as con:
+            rows = con.execute("""SELECT bootstrap, state, status, COUNT(*), AVG(end_time - start_time) FROM jobs
+                                  GROUP BY bootstrap, state, status ORDER BY bootstrap, state, status""").fetchall()
+        return rows
@@ -0,0 +1,90 @@
+import json
+import os
+from pathlib import Path
+from amppy.fitresults import FitResults
+from amppy.configs import load_config
+
+def use_shared_normints(config, read=True):
+    """
+    Line transform for AmpToolsConfig.render pointing every normintfile (directly or through its loop)
+    at the copy in the bin directory. With read=True the fit reads it ("input" flag) instead of computing it.
+    """
+    normint_files = set(config.get_normint_files())
+    def transform(line_parts):
+        if not line_parts or line_parts[0] not in ("loop", "normintfile"):
+            return None
+        line_parts = [("../" + part if part in normint_files else part) for part in line_parts]
+        if read and line_parts[0] == "normintfile" and line_parts[-1] != "input":
+            line_parts.append("input")
+        return line_parts
+    return transform
+
+
+def get_stamp_path(bin_config):
+    bin_config = Path(bin_config)
+    return bin_config.parent / f"{bin_config.stem}::normint.json"
+
+def get_stamp(bin_config):
+    # what the integrals depend on: the amplitude lines and the size/modification time of every MC file
+    bin_config = Path(bin_config)
+    config = load_config(bin_config)
+    files = {}
+    for mc_file in config.get_mc_files():
+        # paths in bin configs are relative to an iteration directory, i.e. one level below the bin directory
+        path = Path(os.path.normpath(bin_config.parent / "0" / mc_file))
+        stat = path.stat()
+        files[mc_file] = [stat.st_mtime_ns, stat.st_size]
+    return {"amplitudes": config.amplitude_lines, "files": files}
+
+def normints_are_current(bin_config):
+    bin_config = Path(bin_config)
+    stamp_path = get_stamp_path(bin_config)
+    if not stamp_path.exists():
+        return False
+    if not all([(bin_config.parent / normint_file).exists() for normint_file in load_config(bin_config).get_normint_files()]):
+        return False
+    with open(stamp_path, 'r') as stamp_file:
+        try:
+            stamp = json.load(stamp_file)
+        except json.JSONDecodeError:
+            return False
+    try:
+        return stamp == get_stamp(bin_config)
+    except FileNotFoundError:
+        return False
+
+
+def can_share_normints(bin_config):
+    # amplitudes with free parameters change the integrals during a fit, so they can't be precomputed
+    config = load_config(bin_config)
+    return FitResults != None and bool(config.get_normint_files()) and not config.has_free_amplitude_parameters()
+
+def prepare_normints(bin_config):
+    """
+    Compute the normalization integrals of a bin once, so every iteration can read them instead of
+    integrating the MC itself. Returns True if the bin's fits can use the shared integrals.
+    """
+    bin_config = Path(bin_config)
+    config = load_config(bin_config)
+    if not can_share_normints(bin_config):
+        return False
+    if normints_are_current(bin_config):
+        return True
+    stamp_path = get_stamp_path(bin_config)
+    stamp_path.unlink(missing_ok=True)
+    work_directory = bin_config.parent / "normint"
+    work_directory.mkdir(exist_ok=True)
+    # same layout as an iteration directory so the relative paths resolve, the integrals are written to the bin directory
+    config_path = work_directory / bin_config.name
+    with open(config_path, 'w') as cfg:
+        cfg.writelines(config.render(lambda line_parts, position: {"@uniform": "1.0", "@seed": "1"}.get(line_parts[position], line_parts[position]),
+                                     use_shared_normints(config, read=False)))
+    cwd = os.getcwd()
+    os.chdir(work_directory)
+    try:
+        FitResults.export_normints(str(config_path))
+    finally:
+        os.chdir(cwd)
+    with open(stamp_path, 'w') as stamp_file:
+        json.dump(get_stamp(bin_config), stamp_file)
+    return True
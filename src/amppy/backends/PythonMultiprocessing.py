@@ -1,14 +1,38 @@
-from amppy.backends.Dispatcher import Dispatcher
-from amppy.backends.Fitter import Fitter
+from amppy.backends.Dispatcher import Dispatcher, FitStatus
+from amppy.backends.Fitter import Fitter, fit_in_process
 from multiprocessing import Pool
 import subprocess
 import time
+import queue
+import traceback
 
 def run_pool(tup):
-    bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template = tup
-    f = Fitter()
-    f.setup(bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template)
-    f.fit()
+    bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template, shared_normints = tup
+    try:
+        f = Fitter()
+        f.setup(bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template, shared_normints)
+        status = f.fit()
+    except Exception:
+        traceback.print_exc()
+        status = "UNKNOWN"
+    return bin_num, iteration, status
+
+def run_pool_in_process(tups):
+    # tups all belong to one bin, its data is loaded once and fit from each tup's starting values
+    results = []
+    try:
+        fitters = []
+        for bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template, shared_normints in tups:
+            f = Fitter()
+            f.setup(bin_dir, bin_num, iteration, seed, reaction, bootstrap, config_template, shared_normints)
+            fitters.append(f)
+        for f, status in zip(fitters, fit_in_process(fitters)):
+            results.append((f.bin_number, f.iteration, status))
+    except Exception:
+        traceback.print_exc()
+    finished = {iteration for _, iteration, _ in results}
+    results.extend([(tup[1], tup[2], "UNKNOWN") for tup in tups if tup[2] not in finished])
+    return results
 
 class PythonMultiprocessing(Dispatcher):
     
@@ -19,18 +43,53 @@ class PythonMultiprocessing(Dispatcher):
     @staticmethod
     def add_arguments(parser):
         parser.add_argument("-p", "--processes", type=int, help="number of processes to generate", default=5)
+        parser.add_argument("--chunksize", type=int, help="number of fits handed to a process at a time", default=1)
+        parser.add_argument("--min-events", type=int, help="skip bins with fewer data events than this", default=1)
+        parser.add_argument("--starts-per-process", type=int, help="fit up to this many iterations of a bin in one process, loading its data once (0 runs the fit executable per iteration, bootstrapping always does)", default=0)
 
     def preprocessing(self, **kwargs):
         self.processes = kwargs.get("processes")
         assert self.processes > 0
+        self.normint_processes = self.processes
+        self.chunksize = kwargs.get("chunksize") or 1
+        assert self.chunksize > 0
+        self.bin_costs = self.get_bin_costs(kwargs.get("min_events", 1))
+        self.starts_per_process = kwargs.get("starts_per_process") or 0
+        assert self.starts_per_process >= 0
+        self.completion_queue = queue.Queue()
 
     
     def update_status(self):
         self.status_bar.update(f"Submitting using Python Multiprocessing Pool with {self.processes} process(es)")
 
+
+    def fit_callback(self, result):
+        bin_num, iteration, status = result
+        self.notify_completion(bin_num, iteration, FitStatus[status])
+
     
+    def group_by_bin(self, input_tups):
+        # consecutive runs of the (cost-sorted) tups of one bin, at most starts_per_process long
+        groups = []
+        for tup in input_tups:
+            if groups and groups[-1][0][1] == tup[1] and len(groups[-1]) < self.starts_per_process:
+                groups[-1].append(tup)
+            else:
+                groups.append([tup])
+        return groups
+
     def submit_jobs(self):
-        input_tups = [(self.bin_dirs[bin_num], bin_num, iteration, self.get_seed(iteration), self.reaction, self.bootstrap, self.config_template) for bin_num in range(self.n_bins) for iteration in range(self.iterations)]
+        active_jobs = self.get_active_jobs() # resume from the ledger, finished fits and skipped bins are not resubmitted
+        input_tups = [(self.bin_dirs[bin_num], bin_num, iteration, self.get_seed(iteration), self.reaction, self.bootstrap, self.config_template, self.shared_normints) for bin_num in range(self.n_bins) for iteration in range(self.iterations) if active_jobs[bin_num][iteration]]
+        # most expensive bins first so a slow bin doesn't leave the other processes idle at the end
+        input_tups.sort(key=lambda tup: self.bin_costs[tup[1]], reverse=True)
         with Pool(processes=self.processes) as pool:
-            p = pool.map(run_pool, input_tups)
+            if self.starts_per_process > 0 and not self.bootstrap:
+                # bootstrapped iterations resample the data, so they can't share a loaded bin
+                for results in pool.imap_unordered(run_pool_in_process, self.group_by_bin(input_tups), chunksize=1):
+                    for result in results:
+                        self.fit_callback(result)
+            else:
+                for result in pool.imap_unordered(run_pool, input_tups, chunksize=self.chunksize):
+                    self.fit_callback(result)
         print("Done!")
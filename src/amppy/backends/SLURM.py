@@ -1,10 +1,112 @@
 from amppy.backends.Dispatcher import Dispatcher
+from amppy.backends.NormInt import can_share_normints, normints_are_current
 import subprocess
 from pathlib import Path
 import time
 import os
+import threading
+import getpass
 import numpy as np
 
+ACTIVE_STATES = {"PENDING", "RUNNING", "REQUEUED", "RESIZING", "SUSPENDED", "CONFIGURING", "COMPLETING"}
+
+def expand_array_tasks(task_string):
+    # sacct collapses pending array tasks into strings like "[4-9,12%5]"
+    task_string = task_string.strip("[]").split("%")[0]
+    tasks = []
+    for part in task_string.split(","):
+        if "-" in part:
+            low, high = part.split("-")
+            tasks.extend(range(int(low), int(high) + 1))
+        elif part:
+            tasks.append(int(part))
+    return tasks
+
+
+def parse_walltime(walltime):
+    # SLURM time limits ("M", "M:SS", "H:MM:SS", "D-H", "D-H:MM" or "D-H:MM:SS") to seconds
+    days, _, clock = walltime.rpartition("-")
+    fields = [int(field) for field in clock.split(":")]
+    if len(fields) > 3:
+        raise ValueError(f"Invalid wall time: {walltime}")
+    if days:
+        hours, minutes, seconds = fields + [0] * (3 - len(fields))
+    elif len(fields) == 3:
+        hours, minutes, seconds = fields
+    else:
+        hours = 0
+        minutes, seconds = fields + [0] * (2 - len(fields))
+    return ((int(days or 0) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+class SlurmStatus():
+    """
+    Cached view of the states of the array tasks submitted by amppy.
+
+    A single sacct and squeue call restricted to the submitted job IDs is made at most once per
+    interval, every caller in between gets the cached {(job_id, task_id): state} map. squeue covers
+    clusters without accounting (or a failing sacct), a task neither of them knows about has ended.
+    """
+
+    def __init__(self, interval=10):
+        self.interval = interval
+        self.job_ids = []
+        self._states = {}
+        self._complete = False
+        self._last_query = None
+        self._lock = threading.Lock()
+
+    def add_job(self, job_id):
+        with self._lock:
+            self.job_ids.append(str(job_id))
+            self._last_query = None # force a refresh so the new job shows up as pending
+
+    def run_query(self, command):
+        # {(job_id, task_id): state} from one sacct or squeue call, None if it failed
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+        if process.returncode != 0:
+            return None
+        states = {}
+        for line in process.stdout.splitlines():
+            fields = line.strip().split("|")
+            if len(fields) < 2 or "_" not in fields[0]:
+                continue
+            job_id, tasks = fields[0].split("_", 1)
+            if job_id not in self.job_ids:
+                continue
+            state = fields[1].split()[0] # "CANCELLED by 1234" -> "CANCELLED"
+            for task in expand_array_tasks(tasks):
+                states[(job_id, task)] = state
+        return states
+
+    def query(self):
+        # (states, complete), complete if squeue answered so every task still known to SLURM is in states
+        accounted = self.run_query(['sacct', '-n', '-X', '-P', '-o', 'JobID,State', '-j', ",".join(self.job_ids)])
+        # by user rather than job ID, squeue fails on the IDs of jobs which already left the queue
+        queued = self.run_query(['squeue', '-h', '-r', '-o', '%i|%T', '-u', getpass.getuser()])
+        if accounted == None and queued == None:
+            return None
+        states = dict(accounted or {})
+        if queued != None:
+            # squeue lists every task which is still queued or running, an active sacct state is just lagging behind
+            states = {task: ("MISSING" if state in ACTIVE_STATES else state) for task, state in states.items()}
+            states.update(queued)
+        return states, queued != None
+
+    def get_states(self):
+        with self._lock:
+            if self.job_ids and (self._last_query == None or time.time() - self._last_query >= self.interval):
+                result = self.query()
+                if result != None: # keep the last known states if SLURM couldn't be reached
+                    self._states, self._complete = result
+                self._last_query = time.time()
+            return self._states
+
+    @property
+    def complete(self):
+        return self._complete
+
+
 class SLURM(Dispatcher):
     @staticmethod
     def dispatcher_description():
@@ -13,45 +115,150 @@ class SLURM(Dispatcher):
     @staticmethod
     def add_arguments(parser):
         parser.add_argument("--queue", choices=["red", "green", "blue"], help="select which queue to use", default="red")
+        parser.add_argument("--throttle", type=int, help="maximum number of simultaneously running fits per bin (0 for no limit)", default=0)
+        parser.add_argument("--poll-interval", type=int, help="seconds between queries of the job states", default=10)
+        parser.add_argument("--bundle-walltime", help="run several fits per job, packing as many as fit in this wall time (SLURM format, like H:MM:SS or D-HH:MM:SS)")
+        parser.add_argument("--fit-time", type=float, help="estimated seconds per fit used for bundling (default: mean of finished fits, or 60)")
 
     def preprocessing(self, **kwargs):
         self.queue = str(kwargs.get("queue"))
         self.threads = 4
+        self.throttle = kwargs.get("throttle") or 0
+        self.status = SlurmStatus(interval=kwargs.get("poll_interval") or 10)
+        self.array_jobs = {} # job ID -> (bin, [[iterations] for each array task])
+        self.bundle_walltime = kwargs.get("bundle_walltime")
+        self.fit_time = kwargs.get("fit_time")
+        self.normint_jobs = {} # bin -> job ID of the job computing its normalization integrals
         if self.queue == "green":
             self.cpu_memory = 1590
         elif self.queue == "red":
             self.cpu_memory = 1990
 
+    def get_task_states(self):
+        # {(bin, iteration): scheduler state} for every submitted task, a task which neither sacct nor squeue
+        # reports has ended (MISSING), unless squeue failed, then it is assumed to be PENDING
+        states = self.status.get_states()
+        missing_state = "MISSING" if self.status.complete else "PENDING"
+        task_states = {}
+        for job_id, (bin_num, bundles) in self.array_jobs.items():
+            for task_id, iterations in enumerate(bundles):
+                for iteration in iterations:
+                    task_states[(bin_num, iteration)] = states.get((job_id, task_id), missing_state)
+        return task_states
+
     def postprocessing(self, **kwargs):
         while np.any(self.get_active_jobs()):
+            task_states = self.get_task_states()
+            if all([state not in ACTIVE_STATES for state in task_states.values()]):
+                statuses = self.ledger.get_statuses(self.bootstrap)
+                # the scheduler is done with every task, anything which didn't report back to the ledger
+                # was killed (OUT_OF_MEMORY, TIMEOUT, ...) or crashed
+                for (bin_num, iteration), state in task_states.items():
+                    if (bin_num, iteration) not in statuses:
+                        print(f"Bin {bin_num} iteration {iteration} ended with SLURM state {state}")
+                        self.ledger.finish(bin_num, iteration, self.bootstrap, "FAILED")
+                break
             time.sleep(5)
 
     def update_status(self):
-        username = os.getlogin()
-        n_jobs_queued = len(subprocess.run(['squeue', '-h', '-u', username], stdout=subprocess.PIPE).stdout.decode('utf-8').splitlines())
-        n_jobs_running = len(subprocess.run(['squeue', '-h', '-u', username, '-t', 'running'], stdout=subprocess.PIPE).stdout.decode('utf-8').splitlines())
-        self.status_bar.update(f"{n_jobs_queued - n_jobs_running} job(s) currently queued, {n_jobs_running} job(s) running")
+        counts = {}
+        for state in self.get_task_states().values():
+            counts[state] = counts.get(state, 0) + 1
+        n_failed = counts.get("FAILED", 0) + counts.get("CANCELLED", 0) + counts.get("NODE_FAIL", 0)
+        self.status_bar.update(f"{counts.get('PENDING', 0)} job(s) currently queued, {counts.get('RUNNING', 0)} job(s) running, "
+                               f"{n_failed} failed, {counts.get('OUT_OF_MEMORY', 0)} out of memory, {counts.get('TIMEOUT', 0)} timed out")
         time.sleep(1)
 
 
+    def prepare_normints(self):
+        # integrals are computed on the cluster, one job per bin which the bin's fits wait for, bins
+        # which can't share integrals or whose stamped integrals still match their config and MC need no job
+        active_jobs = self.get_active_jobs()
+        for bin_num, bin_dir in enumerate(self.bin_dirs):
+            if not any(active_jobs[bin_num]):
+                continue
+            bin_config = self.get_bin_config(bin_num)
+            if not can_share_normints(bin_config) or normints_are_current(bin_config):
+                continue
+            slurm_args = ["sbatch",
+                          f"--job-name={self.reaction}_{bin_dir.name}_normint",
+                          "--ntasks=1",
+                          f"--partition={self.queue}",
+                          f"--mem={self.cpu_memory * self.threads}",
+                          "--time=1:00:00",
+                          "--parsable"]
+            command_args = [str(bin_dir),
+                            str(bin_num),
+                            "normint",
+                            str(bin_config),
+                            str(self.reaction),
+                            str(self.bootstrap),
+                            str(self.config_template)]
+            r = subprocess.run(slurm_args + ["sbatch_job.csh"] + command_args, stdout=subprocess.PIPE, universal_newlines=True)
+            job_id = r.stdout.strip().split(";")[0]
+            if job_id:
+                self.normint_jobs[bin_num] = job_id
+
+
+    def get_task_file(self, bin_num):
+        tag = "_bootstrap" if self.bootstrap else ""
+        return self.bin_dirs[bin_num] / f"{self.config_template.stem}_{bin_num}{tag}::tasks.txt"
+
+    def write_task_file(self, bin_num, bundles):
+        # lines are "<array task>\t<iteration>\t<seed>", read back by amppy_fit.py
+        task_file = self.get_task_file(bin_num)
+        with open(task_file, 'w') as tasks:
+            for task_id, iterations in enumerate(bundles):
+                for iteration in iterations:
+                    tasks.write(f"{task_id}\t{iteration}\t{self.get_seed(iteration)}\n")
+        return task_file
+
+    def get_bundle_size(self):
+        # fits per array task: as many as fill the wall time on all of the job's cores
+        if not self.bundle_walltime:
+            return 1
+        fit_time = self.fit_time
+        if not fit_time:
+            fit_time = self.ledger.get_mean_fit_time(self.bootstrap) or 60
+        return max(1, int(parse_walltime(self.bundle_walltime) * self.threads // fit_time))
+
     def submit_jobs(self):
+        # one job array per bin instead of one sbatch call per fit
+        active_jobs = self.get_active_jobs()
+        bundle_size = self.get_bundle_size()
         for bin_num, bin_dir in enumerate(self.bin_dirs):
-            for iteration in range(self.iterations):
-                if not self.is_fit(bin_num, iteration):
-                    slurm_args = ["sbatch",
-                                  f"--job-name={self.reaction}_{bin_dir.name}_{iteration}",
-                                  f"--ntasks={self.threads}",
-                                  f"--partition={self.queue}",
-                                  f"--mem={self.cpu_memory * self.threads}",
-                                  f"--time=1:00:00",
-                                  "--quiet"]
-                    slurm_command = ["sbatch_job.csh"]
-                    command_args = [str(bin_dir),
-                                    str(bin_num),
-                                    str(iteration),
-                                    str(self.get_seed(iteration)),
-                                    str(self.reaction),
-                                    str(self.bootstrap),
-                                    str(self.config_template)]
-                    r = subprocess.run(slurm_args + slurm_command + command_args, stdout=subprocess.PIPE)
-                    time.sleep(1)
+            iterations = [iteration for iteration in range(self.iterations) if active_jobs[bin_num][iteration]]
+            if not iterations:
+                continue
+            bundles = [iterations[i:i + bundle_size] for i in range(0, len(iterations), bundle_size)]
+            task_file = self.write_task_file(bin_num, bundles)
+            array = f"0-{len(bundles) - 1}"
+            if self.throttle > 0:
+                array += f"%{self.throttle}"
+            slurm_args = ["sbatch",
+                          f"--job-name={self.reaction}_{bin_dir.name}",
+                          f"--array={array}",
+                          "--nodes=1",
+                          "--ntasks=1",
+                          f"--cpus-per-task={self.threads}",
+                          f"--partition={self.queue}",
+                          f"--mem={self.cpu_memory * self.threads}",
+                          f"--time={self.bundle_walltime if self.bundle_walltime else '1:00:00'}",
+                          "--parsable"]
+            if bin_num in self.normint_jobs:
+                # afterany: if the integrals couldn't be computed the fits still run and integrate the MC themselves
+                slurm_args.append(f"--dependency=afterany:{self.normint_jobs[bin_num]}")
+            slurm_command = ["sbatch_job.csh"]
+            command_args = [str(bin_dir),
+                            str(bin_num),
+                            "array",
+                            str(task_file),
+                            str(self.reaction),
+                            str(self.bootstrap),
+                            str(self.config_template),
+                            str(self.shared_normints)]
+            r = subprocess.run(slurm_args + slurm_command + command_args, stdout=subprocess.PIPE, universal_newlines=True)
+            job_id = r.stdout.strip().split(";")[0] # --parsable prints "<job ID>[;<cluster>]"
+            if job_id:
+                self.array_jobs[job_id] = (bin_num, bundles)
+                self.status.add_job(job_id)
@@ -0,0 +1,138 @@
+from functools import lru_cache
+from math import cos, sin
+from pathlib import Path
+
+class AmpToolsConfig():
+    """
+    An AmpTools config file parsed once into its loops, amplitudes, initializations, @tags and polarizations.
+
+    Instances are shared through load_config and must not be modified. New configs are written with
+    render, which only touches the lines containing @tags.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'r') as cfg:
+            self.lines = cfg.readlines()
+        self.parts = [line.split() for line in self.lines]
+        self.loops = {} # loop name -> [values]
+        self.reaction = None
+        self.amplitudes = [] # amplitude names in the order of the file
+        self.amplitude_lines = []
+        self.polarizations = [] # polarization tags like "_000", from the "define polAngle_000" lines
+        self.initializations = {} # amplitude -> (coordinates, value 1, value 2, extra flags like "real"/"fixed")
+        self.tags = set() # @tags still to be filled in
+        self.tagged_lines = [] # indices of the lines containing @tags, the "compiled" template
+        for index, line_parts in enumerate(self.parts):
+            if not line_parts:
+                continue
+            keyword = line_parts[0]
+            if keyword.startswith("#"):
+                continue
+            if keyword == "loop" and len(line_parts) > 2:
+                self.loops[line_parts[1]] = line_parts[2:]
+            elif keyword == "reaction":
+                self.reaction = line_parts[1] # the last reaction line wins, as it did when the Dispatcher read it
+            elif keyword == "amplitude":
+                self.amplitudes.append(line_parts[1])
+                self.amplitude_lines.append(self.lines[index].strip())
+            elif keyword == "define" and line_parts[1].startswith("polAngle"):
+                self.polarizations.append(line_parts[1].replace("polAngle", ""))
+            elif keyword == "initialize" and len(line_parts) > 4:
+                self.initializations[line_parts[1]] = (line_parts[2], line_parts[3], line_parts[4], line_parts[5:])
+            tags = [part for part in line_parts if part.startswith("@")]
+            if tags:
+                self.tags.update(tags)
+                self.tagged_lines.append(index)
+
+    def get_lines(self, keyword):
+        # split lines starting with keyword
+        return [line_parts for line_parts in self.parts if line_parts and line_parts[0] == keyword]
+
+    def expand(self, line_parts):
+        # AmpTools loop expansion: a line using loop names stands for one line per loop value
+        lengths = [len(self.loops[part]) for part in line_parts if part in self.loops]
+        if not lengths or line_parts[0] == "loop":
+            return [line_parts]
+        return [[(self.loops[part][i] if part in self.loops else part) for part in line_parts] for i in range(lengths[0])]
+
+    def get_expanded_lines(self, keyword):
+        return [expanded for line_parts in self.get_lines(keyword) for expanded in self.expand(line_parts)]
+
+    def get_files(self, keywords, position):
+        # the token at position of every keyword line, with loops expanded
+        return [line_parts[position] for keyword in keywords for line_parts in self.get_expanded_lines(keyword) if len(line_parts) > position]
+
+
+    def get_normint_files(self):
+        # normintfile <reaction> <file> [input]
+        return self.get_files(["normintfile"], 2)
+
+    def get_mc_files(self):
+        # accmc/genmc <reaction> <reader> <file> [reader args]
+        return self.get_files(["accmc", "genmc"], 3)
+
+    def has_free_amplitude_parameters(self):
+        # amplitudes with [parameter] arguments
+        return any(["[" in line for line in self.amplitude_lines])
+
+    def get_constraint_groups(self):
+        # {amplitude: [amplitudes constrained to it, itself included]}
+        groups = {}
+        for line_parts in self.get_expanded_lines("constrain"):
+            group = []
+            for amp in line_parts[1:]:
+                group.extend([member for member in groups.get(amp, [amp]) if member not in group])
+            for amp in group:
+                groups[amp] = group
+        return groups
+
+    def get_starting_values(self):
+        # {amplitude: complex start} of initializations without @tags
+        starts = {}
+        for amp, (coordinates, value1, value2, _) in self.initializations.items():
+            if value1.startswith("@") or value2.startswith("@"):
+                continue
+            if coordinates == "cartesian":
+                starts[amp] = complex(float(value1), float(value2))
+            elif coordinates == "polar":
+                starts[amp] = float(value1) * complex(cos(float(value2)), sin(float(value2)))
+        return starts
+
+
+    def render(self, substitute, transform=None):
+        """
+        Lines of a new config with every @tag replaced by substitute(line_parts, position).
+
+        substitute is called once per tag in file order. transform(line_parts) may change any
+        (split) line and returns it, or None to keep the line unchanged.
+        """
+        lines = list(self.lines)
+        for index in self.tagged_lines:
+            line_parts = list(self.parts[index])
+            for position, part in enumerate(line_parts):
+                if part.startswith("@"):
+                    line_parts[position] = substitute(line_parts, position)
+            lines[index] = " ".join(line_parts) + "\n"
+        if transform != None:
+            for index, line in enumerate(lines):
+                line_parts = transform(line.split())
+                if line_parts != None:
+                    lines[index] = " ".join(line_parts) + "\n"
+        return lines
+
+    def render_tags(self, values):
+        # lines with the @tags found in values replaced, others left in place
+        return self.render(lambda line_parts, position: values.get(line_parts[position], line_parts[position]))
+
+
+@lru_cache(maxsize=128)
+def load_cached_config(path, mtime_ns, size, inode, ctime_ns):
+    return AmpToolsConfig(path)
+
+def load_config(path):
+    # parsed once per file version, every caller gets the same AmpToolsConfig until the file changes,
+    # the size, inode and ctime catch rewrites and replacements within the mtime resolution
+    path = Path(path).resolve()
+    stat = path.stat()
+    return load_cached_config(path, stat.st_mtime_ns, stat.st_size, stat.st_ino, stat.st_ctime_ns)
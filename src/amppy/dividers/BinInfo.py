@@ -0,0 +1,149 @@
+from pathlib import Path
+import numpy as np
+
+def get_bin_info_path(root):
+    return Path(root) / "bin_info.txt"
+
+def get_equal_population_edges(counts, fine_edges, n_bins):
+    # edges at the n_bins-quantiles of a finely binned histogram, accurate to one fine bin, quantiles
+    # falling into the same fine bin give a single edge so fewer than n_bins bins can come back
+    cumulative = np.cumsum(counts)
+    if cumulative[-1] == 0:
+        return np.linspace(fine_edges[0], fine_edges[-1], n_bins + 1)
+    quantiles = cumulative[-1] * np.arange(1, n_bins) / n_bins
+    inner_edges = fine_edges[1:][np.searchsorted(cumulative, quantiles)]
+    return np.unique(np.concatenate([[fine_edges[0]], inner_edges[inner_edges < fine_edges[-1]], [fine_edges[-1]]]))
+
+def get_merged_edges(counts, fine_edges, fine_bins_per_bin, min_count):
+    # the uniform bins made of fine_bins_per_bin fine bins each, with neighbours merged until every bin has min_count events
+    bin_counts = counts.reshape(-1, fine_bins_per_bin).sum(axis=1)
+    uniform_edges = fine_edges[::fine_bins_per_bin]
+    edges = [uniform_edges[0]]
+    contents = 0
+    for bin_n, bin_count in enumerate(bin_counts):
+        contents += bin_count
+        if contents >= min_count:
+            edges.append(uniform_edges[bin_n + 1])
+            contents = 0
+    if edges[-1] != uniform_edges[-1]:
+        # the sparse (or empty) leftover at the high end joins the last full bin, so the binning still ends at high
+        if len(edges) > 1:
+            edges.pop()
+        edges.append(uniform_edges[-1])
+    return np.array(edges)
+
+
+class BinInfo():
+    """
+    The binning of a fit directory, one or more axes (like mass and |t|) with explicit edges.
+
+    Bins are numbered by flattening the per-axis bin indices in C order, so the last axis varies
+    fastest and bin n lives in the directory <root>/n. bin_info.txt holds one line per bin with its
+    centers and edges, the header's first two columns keep the old "bin=low,high" and "mass=unit" form.
+    """
+
+    def __init__(self, axes):
+        self.axes = [(name, unit, np.asarray(edges, dtype=np.float64)) for name, unit, edges in axes]
+        for name, _, edges in self.axes:
+            assert len(edges) > 1 and np.all(np.diff(edges) > 0), f"Bin edges of {name} must be increasing"
+
+    @staticmethod
+    def uniform(name, unit, low, high, n_bins):
+        assert low < high, "Low value must be smaller than high value"
+        return BinInfo([(name, unit, np.linspace(low, high, n_bins + 1))])
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.axes]
+
+    @property
+    def shape(self):
+        return tuple([len(edges) - 1 for _, _, edges in self.axes])
+
+    @property
+    def n_bins(self):
+        return int(np.prod(self.shape))
+
+    def get_edges(self, axis=0):
+        return self.axes[axis][2]
+
+    def with_edges(self, axis, edges):
+        # copy with new edges along one axis
+        return BinInfo([(name, unit, edges if i == axis else old_edges) for i, (name, unit, old_edges) in enumerate(self.axes)])
+
+    def is_uniform(self):
+        return all([np.allclose(np.diff(edges), edges[1] - edges[0]) for _, _, edges in self.axes])
+
+    def get_axis_indices(self, bin_n):
+        # per-axis indices of a flat bin number
+        return np.unravel_index(bin_n, self.shape)
+
+    def get_bin_range(self, bin_n, axis=0):
+        index = self.get_axis_indices(bin_n)[axis]
+        edges = self.get_edges(axis)
+        return edges[index], edges[index + 1]
+
+    def get_center(self, bin_n, axis=0):
+        low, high = self.get_bin_range(bin_n, axis)
+        return (low + high) / 2
+
+    def get_label(self, bin_n, axes=None):
+        # "(1.0 - 1.04) GeV/$c^2$, (0.1 - 0.2) GeV$^2$"
+        if axes == None:
+            axes = range(len(self.axes))
+        labels = []
+        for axis in axes:
+            low, high = self.get_bin_range(bin_n, axis)
+            labels.append(f"({round(low, 3)} - {round(high, 3)}) {self.axes[axis][1]}")
+        return ", ".join(labels)
+
+    def get_slices(self):
+        # [(bins along the first axis in order)] for every combination of the other axes' bins
+        return [[int(bin_n) for bin_n in bins] for bins in np.arange(self.n_bins).reshape(self.shape[0], -1).T]
+
+    def get_bin_indices(self, values):
+        # flat bin of every event given {axis name: array of values}, -1 outside of the binning
+        axis_indices = []
+        outside = None
+        for name, _, edges in self.axes:
+            indices = np.digitize(values[name], edges) - 1
+            invalid = (indices < 0) | (indices >= len(edges) - 1)
+            outside = invalid if outside is None else outside | invalid
+            axis_indices.append(np.where(invalid, 0, indices))
+        flat_indices = np.ravel_multi_index(tuple(axis_indices), self.shape)
+        flat_indices[outside] = -1
+        return flat_indices
+
+
+    def write(self, path):
+        first_edges = self.get_edges(0)
+        header = [f"bin={first_edges[0]},{first_edges[-1]}"] + [f"{name}={unit}" for name, unit, _ in self.axes]
+        header += [f"{name}_low\t{name}_high" for name in self.names]
+        lines = ["\t".join(header) + "\n"]
+        for bin_n in range(self.n_bins):
+            ranges = [self.get_bin_range(bin_n, axis) for axis in range(len(self.axes))]
+            fields = [str(bin_n)] + [str((low + high) / 2) for low, high in ranges] + [f"{low}\t{high}" for low, high in ranges]
+            lines.append("\t".join(fields) + "\n")
+        with open(path, 'w') as writer:
+            writer.writelines(lines)
+
+    @staticmethod
+    def read(path):
+        with open(path, 'r') as reader:
+            lines = [line.rstrip("\n").split("\t") for line in reader.readlines() if line.strip()]
+        header, rows = lines[0], lines[1:]
+        axis_columns = [column.split("=", 1) for column in header[1:] if "=" in column]
+        if len(header) == 2:
+            # old single-axis files: "bin=low,high\tmass=unit" followed by the bin centers
+            low, high = [float(val) for val in header[0].split("=")[1].split(",")]
+            name, unit = axis_columns[0]
+            return BinInfo.uniform(name, unit, low, high, len(rows))
+        axes = []
+        for axis, (name, unit) in enumerate(axis_columns):
+            low_column = header.index(f"{name}_low")
+            lows = sorted(set([float(row[low_column]) for row in rows]))
+            high = max([float(row[low_column + 1]) for row in rows])
+            axes.append((name, unit, lows + [high]))
+        bin_info = BinInfo(axes)
+        assert bin_info.n_bins == len(rows), f"{path} does not describe a full grid of bins"
+        return bin_info
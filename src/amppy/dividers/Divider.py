@@ -3,7 +3,10 @@ import errno
 from pathlib import Path
 import numpy as np
 import os
+import traceback
+from multiprocessing import Pool
 from halo import Halo
+from amppy.dividers.BinInfo import BinInfo, get_bin_info_path
 
 class Divider(ABC):
 
@@ -13,12 +16,14 @@ class Divider(ABC):
         self._config_template = None
         self._low_high_tuple = None
         self._n_bins = None
+        self._bin_info = None
         self._data_directory = None
         self._generated_directory = None
         self._accepted_directory = None
         self._background_directory = None
         self._tmp_directory = None
         self._config_replacements = None
+        self.processes = os.cpu_count()
     
     @abstractmethod
     def gen_config(self):
@@ -27,6 +32,7 @@ class Divider(ABC):
 
     @abstractmethod
     def divide_file(self, in_file, out_stem, **kwargs):
+        # writes <out_stem>_<bin>.root files into the tmp directory, raises if the file could not be divided
         pass
 
 
@@ -77,6 +83,22 @@ class Divider(ABC):
         assert n > 0, "Must have a positive number of bins"
         self._n_bins = n
 
+    @property
+    def bin_info(self):
+        return self._bin_info
+
+    @bin_info.setter
+    def bin_info(self, bin_info):
+        self.check_bin_info(bin_info)
+        self._bin_info = bin_info
+        first_edges = bin_info.get_edges(0)
+        self.low_high_tuple = (first_edges[0], first_edges[-1])
+        self.n_bins = bin_info.n_bins
+
+    def check_bin_info(self, bin_info):
+        # raise if this divider can't produce the given binning
+        pass
+
     @property
     def data_directory(self):
         return self._data_directory
@@ -147,37 +169,37 @@ class Divider(ABC):
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
 
 
-    def divide_directory(self, in_directory, tag, **kwargs):
-        in_files = in_directory.glob("*.root")
+    def get_divide_tasks(self, in_directory, tag, **kwargs):
+        return [(self, in_file, in_file.stem + tag, kwargs) for in_file in in_directory.glob("*.root")]
+
+    def divide_files(self, tasks, spinner):
+        # split every file in a process pool, largest first so a big thrown MC file doesn't start last
         if self._tmp_directory == None:
             self.create_tmp()
-        os.chdir(str(self._tmp_directory))
-        for in_file in in_files:
-            self.divide_file(in_file, in_file.stem + tag, **kwargs)
-        os.chdir(str(self.root_directory))
-
-    def write_bin_info(self, header):
-        with open(self.root_directory / "bin_info.txt", 'w') as writer:
-            low, high = self.low_high_tuple
-            step = (high - low) / self.n_bins
-            bin_edges = [low + n * step for n in range(self.n_bins + 1)]
-            bin_centers = [((b - a) / 2) + a for a, b in zip(bin_edges[:-1], bin_edges[1:])]
-            lines = [header]
-            for i, content in enumerate(bin_centers):
-                lines.append(f"{i}\t{content}\n")
-            writer.writelines(lines)
+        tasks = sorted(tasks, key=lambda task: task[1].stat().st_size, reverse=True)
+        failures = []
+        with Pool(processes=max(1, min(self.processes, len(tasks)))) as pool:
+            for n_done, (in_file, error) in enumerate(pool.imap_unordered(run_divide_file, tasks), start=1):
+                if error != None:
+                    failures.append((in_file, error))
+                spinner.text = f"Dividing files ({n_done}/{len(tasks)}, {len(failures)} failed): {in_file.name}"
+        if failures:
+            spinner.fail(f"{len(failures)}/{len(tasks)} file(s) could not be divided")
+            for in_file, error in failures:
+                print(f"{in_file}:\n{error}")
+            raise RuntimeError(f"Failed to divide {', '.join([in_file.name for in_file, _ in failures])}")
+        spinner.succeed(f"{len(tasks)} file(s) divided")
+
+    def divide_directory(self, in_directory, tag, **kwargs):
+        spinner = Halo(text=f"Dividing {in_directory}", spinner='dots')
+        spinner.start()
+        self.divide_files(self.get_divide_tasks(in_directory, tag, **kwargs), spinner)
+
+    def write_bin_info(self):
+        self.bin_info.write(get_bin_info_path(self.root_directory))
 
     def get_bin_info(self):
-        with open(self.root_directory / "bin_info.txt") as reader:
-            lines = reader.readlines()
-            bin_numbers = []
-            bin_centers = []
-            for line in lines[1:]:
-                line = line.strip()
-                bin_number, bin_center = line.split("\t")
-                bin_numbers += [bin_number]
-                bin_centers += [bin_center]
-        return bin_numbers, bin_centers
+        return BinInfo.read(get_bin_info_path(self.root_directory))
 
 
     def create_tmp(self):
@@ -213,7 +235,7 @@ class Divider(ABC):
         self.generated_directory = Path(gen).resolve()
         self.accepted_directory = Path(acc).resolve()
         if bkg != None:
-            self.background_directory = path(bkg).resolve()
+            self.background_directory = Path(bkg).resolve()
 
 
     def preprocessing(self, **kwargs):
@@ -223,27 +245,27 @@ class Divider(ABC):
         pass
 
     
-    def divide(self, low, high, nbins, root, config, data, gen, acc, bkg=None, variable_name="mass", variable_unit="GeV/$c^2$", **kwargs):
+    def divide(self, low, high, nbins, root, config, data, gen, acc, bkg=None, variable_name="mass", variable_unit="GeV/$c^2$", processes=None, **kwargs):
+        self.divide_bins(BinInfo.uniform(variable_name, variable_unit, low, high, nbins), root, config, data, gen, acc, bkg, processes, **kwargs)
+
+    def divide_bins(self, bin_info, root, config, data, gen, acc, bkg=None, processes=None, **kwargs):
+        # divide into the (possibly multi-dimensional) bins of a BinInfo
         self.preprocessing(**kwargs)
-        self.n_bins = nbins 
-        self.low_high_tuple = (low, high)
+        self.bin_info = bin_info
         self.load_paths(root, config, data, gen, acc, bkg)
+        if processes != None:
+            self.processes = processes
         self.create_bins()
-        self.write_bin_info(f"bin={low},{high}\t{variable_name}={variable_unit}\n")
-        spinner = Halo(text='Dividing Data', spinner='dots')
-        spinner.start("Dividing data")
-        self.divide_directory(self.data_directory, "_DATA_", **kwargs)
-        spinner.succeed("Data divided")
-        spinner.start("Dividing thrown/generated MC")
-        self.divide_directory(self.generated_directory, "_GEN_", **kwargs)
-        spinner.succeed("Thrown MC divided")
-        spinner.start("Dividing accepted MC")
-        self.divide_directory(self.accepted_directory, "_ACCEPT_", **kwargs)
-        spinner.succeed("Accepted MC divided")
+        self.write_bin_info()
+        # data, thrown MC, accepted MC and background all share one pool
+        tasks = self.get_divide_tasks(self.data_directory, "_DATA_", **kwargs)
+        tasks += self.get_divide_tasks(self.generated_directory, "_GEN_", **kwargs)
+        tasks += self.get_divide_tasks(self.accepted_directory, "_ACCEPT_", **kwargs)
         if bkg != None:
-            spinner.start("Dividing background")
-            self.divide_directory(self.data_directory, "_BKG_", **kwargs)
-            spinner.succeed("Background divided")
+            tasks += self.get_divide_tasks(self.background_directory, "_BKG_", **kwargs)
+        spinner = Halo(text='Dividing files', spinner='dots')
+        spinner.start()
+        self.divide_files(tasks, spinner)
         spinner.start("Moving ROOT files into bins")
         self.bin_split_files()
         spinner.succeed("ROOT files have been binned")
@@ -254,11 +276,20 @@ class Divider(ABC):
     def add_config(self, root, config):
         self.root_directory = Path(root).resolve()
         self.config_template = Path(config).resolve()
-        bin_numbers, _ = self.get_bin_info()
-        self.n_bins = len(bin_numbers)
+        self.n_bins = self.get_bin_info().n_bins
         self.gen_config()
 
 
+def run_divide_file(tup):
+    # process pool worker, returns the input file and None or the reason it failed
+    divider, in_file, out_stem, kwargs = tup
+    try:
+        divider.divide_file(in_file, out_stem, **kwargs)
+        return in_file, None
+    except Exception:
+        return in_file, traceback.format_exc()
+
+
 def get_divider_type_string(root):
     bin_info = (Path(root) / "bin_info.txt").resolve()
     output = ""
@@ -1,6 +1,7 @@
 from amppy.dividers.Divider import Divider
-from os import system
+import subprocess
 from shutil import copy
+from amppy.configs import load_config
 import argparse
 
 class Divider_split_mass(Divider):
@@ -18,33 +19,33 @@ class Divider_split_mass(Divider):
             acc_files = list(bin_dir.glob(f"*_ACCEPT__{int(i)}.root"))
             data_files = list(bin_dir.glob(f"*_DATA__{int(i)}.root"))
             bkg_files = list(bin_dir.glob(f"*_BKG__{int(i)}.root"))
-            with open(self.config_template) as config:
-                config_text = config.read()
-                for file_pol, tag_pol in file_to_tag.items():
-                    for f in gen_files:
-                        if file_pol in f.name:
-                            config_text = config_text.replace("@GENFILE" + tag_pol,
-                                                              "../" + f.name)
-                    for f in acc_files:
-                        if file_pol in f.name:
-                            config_text = config_text.replace("@ACCFILE" + tag_pol,
-                                                              "../" + f.name)
-                    for f in data_files:
-                        if file_pol in f.name:
-                            config_text = config_text.replace("@DATAFILE" + tag_pol,
-                                                              "../" + f.name)
-                            config_text = config_text.replace("@NIFILE" + tag_pol,
-                                                              self.config_template.stem + "_NIFILE" + tag_pol)
-                    for f in bkg_files:
-                        if file_pol in f.name:
-                            config_text = config_text.replace("@BKGFILE" + tag_pol,
-                                                              "../" + f.name)
+            values = {}
+            for file_pol, tag_pol in file_to_tag.items():
+                for f in gen_files:
+                    if file_pol in f.name:
+                        values["@GENFILE" + tag_pol] = "../" + f.name
+                for f in acc_files:
+                    if file_pol in f.name:
+                        values["@ACCFILE" + tag_pol] = "../" + f.name
+                for f in data_files:
+                    if file_pol in f.name:
+                        values["@DATAFILE" + tag_pol] = "../" + f.name
+                        values["@NIFILE" + tag_pol] = self.config_template.stem + "_NIFILE" + tag_pol
+                for f in bkg_files:
+                    if file_pol in f.name:
+                        values["@BKGFILE" + tag_pol] = "../" + f.name
             bin_config_path = bin_dir / (self.config_template.stem + "_" + str(i) + ".cfg")
             with open(bin_config_path, 'w') as bin_config:
-                bin_config.write(config_text)
+                bin_config.writelines(load_config(self.config_template).render_tags(values))
 
 
-    def divide_file(self, in_file, out_stem, **kwargs):
+    def check_bin_info(self, bin_info):
+        if bin_info.names != ["mass"] or not bin_info.is_uniform():
+            raise ValueError("split_mass only divides into equal mass bins, use Divider_uproot (amppy divide --native) for other binnings")
+
+
+    def get_tree_name(self, out_stem, **kwargs):
+        tree_name = None
         if "DATA" in out_stem:
             tree_name = kwargs.get("data_tree")
         elif "GEN" in out_stem:
@@ -56,5 +57,13 @@ class Divider_split_mass(Divider):
 
         if tree_name == None:
             tree_name = "kin"
+        return tree_name
 
-        system(f"split_mass {str(in_file)} {str(out_stem)} {' '.join(map(str, self.low_high_tuple))} {str(self.n_bins)} -T {tree_name}:kin")
+
+    def divide_file(self, in_file, out_stem, **kwargs):
+        tree_name = self.get_tree_name(out_stem, **kwargs)
+        low, high = self.low_high_tuple
+        result = subprocess.run(["split_mass", str(in_file), str(out_stem), str(low), str(high), str(self.n_bins), "-T", f"{tree_name}:kin"],
+                                cwd=str(self._tmp_directory), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"split_mass exited with code {result.returncode}:\n{result.stdout[-2000:]}")
@@ -0,0 +1,182 @@
+from amppy.dividers.Divider_split_mass import Divider_split_mass
+from amppy.dividers.BinInfo import get_equal_population_edges, get_merged_edges
+from amppy.dividers.EventCache import EventCache
+from multiprocessing import Pool
+from pathlib import Path
+import numpy as np
+import uproot
+from halo import Halo
+
+class Divider_uproot(Divider_split_mass):
+    """
+    Divider which bins AmpTools flat trees with uproot and NumPy instead of halld_sim's split_mass.
+
+    Every input file is read once in chunks and each chunk is written straight into all of its bins'
+    <out_stem>_<bin>.root files. Any combination of the mass of every final state particle but the first
+    (the recoil, like split_mass), |t| at the recoil vertex and the beam energy can be binned at once.
+    Setting cache_directory keeps a columnar copy of every input so re-binning never reads the ROOT files again.
+    """
+
+    step_size = "100 MB"
+    target_mass = 0.938272 # proton target at rest, GeV/c^2
+    # binning variables which can be used as BinInfo axes
+    bin_variables = {"mass": "get_mass", "t": "get_t", "E_beam": "get_beam_energy"}
+    bin_variable_branches = {"mass": ["E_FinalState", "Px_FinalState", "Py_FinalState", "Pz_FinalState"],
+                             "t": ["E_FinalState", "Px_FinalState", "Py_FinalState", "Pz_FinalState"],
+                             "E_beam": ["E_Beam"]}
+    fine_bins_per_bin = 200 # resolution of the histogram adaptive edges are taken from
+    cache_step_size = 1000000 # events per chunk read from the event cache
+    _cache_directory = None
+
+    @property
+    def cache_directory(self):
+        return self._cache_directory
+
+    @cache_directory.setter
+    def cache_directory(self, path):
+        # with a cache directory, each input is converted once to memory-mapped .npy columns (see EventCache)
+        # and every later divide or re-binning of it reads those instead of the ROOT file
+        if path != None:
+            path = Path(path).resolve()
+            path.mkdir(parents=True, exist_ok=True)
+            print(f"Event Cache: {path}")
+        self._cache_directory = path
+
+    def check_bin_info(self, bin_info):
+        for name in bin_info.names:
+            if name not in self.bin_variables:
+                raise ValueError(f"Can't bin on {name}, choose from {', '.join(self.bin_variables)}")
+
+    def get_mass(self, arrays):
+        e = arrays["E_FinalState"][:, 1:].sum(axis=1, dtype=np.float64)
+        px = arrays["Px_FinalState"][:, 1:].sum(axis=1, dtype=np.float64)
+        py = arrays["Py_FinalState"][:, 1:].sum(axis=1, dtype=np.float64)
+        pz = arrays["Pz_FinalState"][:, 1:].sum(axis=1, dtype=np.float64)
+        return np.sqrt(np.maximum(e**2 - px**2 - py**2 - pz**2, 0.0))
+
+    def get_t(self, arrays):
+        # |t| between the target and the recoil
+        e = arrays["E_FinalState"][:, 0].astype(np.float64) - self.target_mass
+        px = arrays["Px_FinalState"][:, 0].astype(np.float64)
+        py = arrays["Py_FinalState"][:, 0].astype(np.float64)
+        pz = arrays["Pz_FinalState"][:, 0].astype(np.float64)
+        return np.abs(e**2 - px**2 - py**2 - pz**2)
+
+    def get_beam_energy(self, arrays):
+        return arrays["E_Beam"].astype(np.float64)
+
+    def get_bin_variables(self, arrays, names=None):
+        # {name: values} of the binning variables (all by default) which can be computed from the given branches
+        if names == None:
+            names = list(self.bin_variables)
+        return {name: getattr(self, self.bin_variables[name])(arrays) for name in names
+                if all([branch in arrays for branch in self.bin_variable_branches[name]])}
+
+    def iterate_file(self, in_file, tree_name, variables, branches=True):
+        # (branch arrays, binning variables) chunks of one input, from the event cache if there is one
+        if self.cache_directory == None:
+            with uproot.open(str(in_file)) as in_root_file:
+                read_branches = None if branches else sorted(set(sum([self.bin_variable_branches[name] for name in variables], [])))
+                for arrays in in_root_file[tree_name].iterate(read_branches, step_size=self.step_size, library='np'):
+                    arrays = {name: fixed_shape(array) for name, array in arrays.items()}
+                    yield (arrays if branches else {}), self.get_bin_variables(arrays, variables)
+            return
+        cache = EventCache(self.cache_directory, in_file, tree_name)
+        if not cache.is_current(variables):
+            with uproot.open(str(in_file)) as in_root_file:
+                tree = in_root_file[tree_name]
+                chunks = ({name: fixed_shape(array) for name, array in arrays.items()} for arrays in tree.iterate(step_size=self.step_size, library='np'))
+                cache.build(tree, chunks, self.get_bin_variables)
+        yield from cache.iterate(self.cache_step_size, branches)
+
+
+    def histogram_file(self, in_file, tree_name, name, fine_edges):
+        # counts of one binning variable in fine bins, reading only the branches it needs (or building the cache)
+        counts = np.zeros(len(fine_edges) - 1, dtype=np.int64)
+        for _, variables in self.iterate_file(in_file, tree_name, [name], branches=False):
+            counts += np.histogram(variables[name], bins=fine_edges)[0]
+        return counts
+
+    def adapt_bin_info(self, bin_info, name, data, min_count=None, processes=None, **kwargs):
+        """
+        bin_info with the edges of one axis moved so its bins have equal data populations, or, with
+        min_count, its uniform bins merged with their neighbours until each holds min_count data events.
+
+        The data are histogrammed in fine bins in one streaming pass, so memory doesn't grow with
+        the input and the edges are accurate to 1/fine_bins_per_bin of a uniform bin.
+        """
+        self.check_bin_info(bin_info)
+        axis = bin_info.names.index(name)
+        edges = bin_info.get_edges(axis)
+        n_bins = len(edges) - 1
+        fine_edges = np.linspace(edges[0], edges[-1], n_bins * self.fine_bins_per_bin + 1)
+        tree_name = self.get_tree_name("_DATA_", **kwargs)
+        tasks = [(self, in_file, tree_name, name, fine_edges) for in_file in Path(data).resolve().glob("*.root")]
+        spinner = Halo(text=f"Histogramming data in {name}", spinner='dots')
+        spinner.start()
+        counts = np.zeros(len(fine_edges) - 1, dtype=np.int64)
+        with Pool(processes=max(1, min(processes or self.processes, len(tasks)))) as pool:
+            for file_counts in pool.imap_unordered(run_histogram_file, tasks):
+                counts += file_counts
+        if min_count == None:
+            new_edges = get_equal_population_edges(counts, fine_edges, n_bins)
+        else:
+            new_edges = get_merged_edges(counts, fine_edges, self.fine_bins_per_bin, min_count)
+        if min_count == None and len(new_edges) - 1 != n_bins:
+            # several quantiles fell into one fine bin, like under a narrow peak, and their edges were merged
+            spinner.warn(f"{len(new_edges) - 1} {name} bins from {counts.sum()} data events instead of {n_bins}, "
+                         f"some equal-population edges fall within 1/{self.fine_bins_per_bin} of a bin of each other")
+        else:
+            spinner.succeed(f"{len(new_edges) - 1} {name} bins from {counts.sum()} data events")
+        return bin_info.with_edges(axis, new_edges)
+
+
+    def get_kin_branch_types(self, in_file, tree_name):
+        # the AmpTools flat tree schema, for inputs without events to take the types from
+        with uproot.open(str(in_file)) as in_root_file:
+            shape = getattr(in_root_file[tree_name]["E_FinalState"].interpretation, "inner_shape", ())
+        n_final_state = shape[0] if shape else 1 # the size is never read back from a tree without events
+        branch_types = {name: "f4" for name in ["Weight", "E_Beam", "Px_Beam", "Py_Beam", "Pz_Beam"]}
+        branch_types["NumFinalState"] = "i4"
+        branch_types.update({name: ("f4", (n_final_state,)) for name in ["E_FinalState", "Px_FinalState", "Py_FinalState", "Pz_FinalState"]})
+        return branch_types
+
+    def create_bin_files(self, out_stem, branch_types):
+        out_files = [uproot.recreate(str(self._tmp_directory / f"{out_stem}_{bin_n}.root")) for bin_n in range(self.n_bins)]
+        for out_file in out_files:
+            out_file.mktree("kin", branch_types)
+        return out_files
+
+    def divide_file(self, in_file, out_stem, **kwargs):
+        tree_name = self.get_tree_name(out_stem, **kwargs)
+        out_files = []
+        try:
+            for arrays, variables in self.iterate_file(in_file, tree_name, self.bin_info.names):
+                if not out_files:
+                    out_files = self.create_bin_files(out_stem, {name: (array.dtype, array.shape[1:]) if array.ndim > 1 else array.dtype
+                                                                 for name, array in arrays.items()})
+                indices = self.bin_info.get_bin_indices(variables)
+                # group the chunk by bin with one sort instead of a mask per bin
+                order = np.argsort(indices, kind='stable')
+                bin_starts = np.searchsorted(indices[order], np.arange(-1, self.n_bins + 1))
+                for bin_n in range(self.n_bins):
+                    start, stop = bin_starts[bin_n + 1], bin_starts[bin_n + 2]
+                    if start < stop:
+                        selection = order[start:stop]
+                        out_files[bin_n]["kin"].extend({name: array[selection] for name, array in arrays.items()})
+            if not out_files:
+                # an input without events gives empty bins, like split_mass
+                out_files = self.create_bin_files(out_stem, self.get_kin_branch_types(in_file, tree_name))
+        finally:
+            for out_file in out_files:
+                out_file.close()
+
+def run_histogram_file(tup):
+    divider, in_file, tree_name, name, fine_edges = tup
+    return divider.histogram_file(in_file, tree_name, name, fine_edges)
+
+def fixed_shape(array):
+    # variable length branches like E_FinalState[NumFinalState] have the same length in every event of a flat tree
+    if array.dtype == object:
+        return np.stack(array)
+    return array
@@ -0,0 +1,79 @@
+from hashlib import sha1
+from pathlib import Path
+import json
+import numpy as np
+
+class EventCache():
+    """
+    Columnar copy of one input tree as memory-mapped .npy files, one per branch plus one per binning variable.
+
+    <cache root>/<file stem>-<hash of the path>-<tree>/ holds branches/<branch>.npy, variables/<name>.npy and
+    stamp.json, which is written last and records the source file's size and modification time. A cache is
+    only used while its stamp matches the source, so a changed or half-written cache is rebuilt.
+    """
+
+    def __init__(self, cache_root, in_file, tree_name):
+        self.in_file = Path(in_file).resolve()
+        self.tree_name = tree_name
+        path_hash = sha1(str(self.in_file).encode()).hexdigest()[:8]
+        self.path = Path(cache_root) / f"{self.in_file.stem}-{path_hash}-{tree_name}"
+        self.stamp_path = self.path / "stamp.json"
+
+    def get_source_stamp(self):
+        stat = self.in_file.stat()
+        return {"source": str(self.in_file), "tree": self.tree_name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def read_stamp(self):
+        if not self.stamp_path.exists():
+            return None
+        with open(self.stamp_path, 'r') as stamp_file:
+            return json.load(stamp_file)
+
+    def is_current(self, variables):
+        # up to date with the source and holding every binning variable asked for
+        stamp = self.read_stamp()
+        if stamp == None:
+            return False
+        return all([stamp[key] == value for key, value in self.get_source_stamp().items()]) and set(variables) <= set(stamp["variables"])
+
+    def build(self, tree, chunks, get_variables):
+        # fill the arrays from (branch arrays) chunks of tree, get_variables(branch arrays) gives {name: values}
+        self.stamp_path.unlink(missing_ok=True)
+        (self.path / "branches").mkdir(parents=True, exist_ok=True)
+        (self.path / "variables").mkdir(parents=True, exist_ok=True)
+        n_events = tree.num_entries
+        columns = None
+        start = 0
+        for arrays in chunks:
+            variables = get_variables(arrays)
+            if columns == None:
+                columns = {("branches", name): array for name, array in arrays.items()}
+                columns.update({("variables", name): values for name, values in variables.items()})
+                columns = {key: np.lib.format.open_memmap(str(self.path / key[0] / f"{key[1]}.npy"), mode='w+',
+                                                          dtype=array.dtype, shape=(n_events,) + array.shape[1:])
+                           for key, array in columns.items()}
+            stop = start + len(next(iter(arrays.values())))
+            for (kind, name), column in columns.items():
+                column[start:stop] = (arrays if kind == "branches" else variables)[name]
+            start = stop
+        for column in (columns or {}).values():
+            column.flush()
+        stamp = self.get_source_stamp()
+        stamp.update({"entries": n_events,
+                      "branches": [name for kind, name in (columns or {}) if kind == "branches"],
+                      "variables": [name for kind, name in (columns or {}) if kind == "variables"]})
+        with open(self.stamp_path, 'w') as stamp_file:
+            json.dump(stamp, stamp_file, indent=4)
+
+    def load(self, kind):
+        # {name: read-only memory map} of the "branches" or "variables"
+        return {name: np.load(str(self.path / kind / f"{name}.npy"), mmap_mode='r') for name in self.read_stamp()[kind]}
+
+    def iterate(self, step_size, branches=True):
+        # (branch arrays, binning variables) in chunks of step_size events, only the selected events are ever read
+        stamp = self.read_stamp()
+        branch_columns = self.load("branches") if branches else {}
+        variable_columns = self.load("variables")
+        for start in range(0, stamp["entries"], step_size):
+            yield ({name: np.asarray(column[start:start + step_size]) for name, column in branch_columns.items()},
+                   {name: np.asarray(column[start:start + step_size]) for name, column in variable_columns.items()})
@@ -2,3 +2,4 @@ from __future__ import absolute_import
 
 from .Divider import Divider
 from .Divider_split_mass import Divider_split_mass
+from .Divider_uproot import Divider_uproot
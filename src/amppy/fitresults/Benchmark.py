@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compare reading .fit files with the compiled FitResults extension and with the NumPy FitFile reader.
+
+usage: python -m amppy.fitresults.Benchmark [--config CONFIG] FIT_FILE [FIT_FILE ...]
+"""
+import argparse
+import time
+import numpy as np
+from amppy.fitresults import FitResults
+from amppy.fitresults.FitFile import FitFile
+
+def read_all(fit):
+    # the quantities both readers provide: the full covariance arrays plus per-amplitude and total intensities
+    covariance = fit.covariance()
+    amplitudes = [str(amp) for amp in covariance["amplitudes"]]
+    intensities = np.array([fit.intensity([amp], True) for amp in amplitudes] + [fit.total_intensity(True), fit.total_intensity(False)])
+    return covariance, intensities, fit.likelihood()
+
+def time_reader(open_reader, paths):
+    results = []
+    start = time.perf_counter()
+    for path in paths:
+        results.append(read_all(open_reader(path)))
+    return time.perf_counter() - start, results
+
+def compare(cython_results, numpy_results):
+    # largest relative difference of every compared quantity over all files
+    differences = {}
+    for (cy_cov, cy_int, cy_like), (np_cov, np_int, np_like) in zip(cython_results, numpy_results):
+        pairs = {key: (cy_cov[key], np_cov[key]) for key in ["production", "values", "covariance", "norm_int", "amp_int"]}
+        pairs["intensities"] = (cy_int, np_int)
+        pairs["likelihood"] = (np.array([cy_like]), np.array([np_like]))
+        for key, (cy_value, np_value) in pairs.items():
+            scale = np.maximum(np.abs(cy_value), 1e-300)
+            differences[key] = max(differences.get(key, 0.0), float(np.max(np.abs(cy_value - np_value) / scale, initial=0.0)))
+    return differences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy .fit reader against the compiled FitResults extension")
+    parser.add_argument("fit_files", nargs="+")
+    parser.add_argument("--config", help="AmpTools config of the fits, used to resolve constrained amplitudes")
+    args = parser.parse_args()
+    numpy_time, numpy_results = time_reader(lambda path: FitFile(path, args.config), args.fit_files)
+    print(f"NumPy FitFile:       {numpy_time:.3f}s ({numpy_time / len(args.fit_files) * 1000:.2f}ms per file)")
+    if FitResults == None:
+        print("FitResults extension is not built, skipping the comparison")
+    else:
+        cython_time, cython_results = time_reader(lambda path: FitResults.FitResultsWrapper(str(path)), args.fit_files)
+        print(f"Cython FitResults:   {cython_time:.3f}s ({cython_time / len(args.fit_files) * 1000:.2f}ms per file)")
+        print("Largest relative differences:")
+        for key, difference in compare(cython_results, numpy_results).items():
+            print(f"    {key:<14}{difference:.3e}")
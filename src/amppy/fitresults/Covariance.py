@@ -0,0 +1,135 @@
+from pathlib import Path
+import json
+import numpy as np
+
+# per-fit arrays written by write_covariance, stacked along a leading fit axis by gather_covariance
+SHARED_KEYS = ["amplitudes", "parameters", "re_index", "im_index"]
+FIT_KEYS = ["production", "scales", "values", "covariance", "norm_int", "amp_int"]
+
+def get_covariance_path(config_template, bootstrap=False):
+    # <root>/<config>::covariance.npz or <root>/<config>_bootstrap::covariance.npz
+    config_template = Path(config_template)
+    tag = "_bootstrap" if bootstrap else ""
+    return config_template.parent / f"{config_template.stem}{tag}::covariance.npz"
+
+def write_covariance(fit, path):
+    # fit is an open FitResultsWrapper or FitFile
+    np.savez_compressed(str(path), **fit.covariance())
+
+def get_covariance_manifest_path(output_path):
+    # <root>/<config>::covariance_manifest.json next to <root>/<config>::covariance.npz
+    output_path = Path(output_path)
+    return output_path.parent / output_path.name.replace("::covariance.npz", "::covariance_manifest.json")
+
+def gather_covariance(paths, bins, iterations, output_path):
+    """
+    Stack the per-fit covariance files of one config into a single file.
+
+    Every fit of a config has the same amplitudes and parameters, so those are stored once. A manifest records
+    the size and modification time of every stacked file, so a later gather only reads new or changed fits.
+    """
+    manifest_path = get_covariance_manifest_path(output_path)
+    previous = {}
+    if Path(output_path).exists() and manifest_path.exists():
+        with open(manifest_path, 'r') as manifest_file:
+            previous = json.load(manifest_file)
+    stamps = {}
+    for path, bin_n, iteration in zip(paths, bins, iterations):
+        stat = Path(path).stat()
+        stamps[f"{bin_n}/{iteration}"] = [stat.st_mtime_ns, stat.st_size]
+    if stamps and stamps == previous:
+        return # nothing new, changed or removed
+    old = None
+    old_rows = {}
+    if previous:
+        with np.load(str(output_path)) as gathered:
+            old = {key: gathered[key] for key in gathered.files}
+        old_rows = {(bin_n, iteration): row for row, (bin_n, iteration) in enumerate(zip(old["Bin"], old["Iteration"]))}
+    shared = None if old == None else {key: old[key] for key in SHARED_KEYS}
+    fits = []
+    for path, bin_n, iteration in zip(paths, bins, iterations):
+        row = old_rows.get((bin_n, iteration))
+        if row != None and previous.get(f"{bin_n}/{iteration}") == stamps[f"{bin_n}/{iteration}"]:
+            fits.append(({key: old[key][row] for key in FIT_KEYS}, bin_n, iteration))
+            continue
+        with np.load(str(path)) as fit:
+            fits.append(({key: fit[key] for key in FIT_KEYS}, bin_n, iteration))
+            if shared == None:
+                shared = {key: fit[key] for key in SHARED_KEYS}
+    if not fits:
+        # nothing left to stack, a previous stack would no longer match the results
+        Path(output_path).unlink(missing_ok=True)
+        manifest_path.unlink(missing_ok=True)
+        return
+    gathered = dict(shared)
+    gathered.update({key: np.stack([fit[key] for fit, _, _ in fits]) for key in FIT_KEYS})
+    gathered["Bin"] = np.array([bin_n for _, bin_n, _ in fits], dtype=np.int32)
+    gathered["Iteration"] = np.array([iteration for _, _, iteration in fits], dtype=np.int32)
+    np.savez(str(output_path), **gathered)
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(stamps, manifest_file)
+
+def read_covariance(config_template, bootstrap=False):
+    with np.load(str(get_covariance_path(config_template, bootstrap))) as gathered:
+        return {key: gathered[key] for key in gathered.files}
+
+
+def get_wave_mask(covariance, waves):
+    # amplitudes (all polarizations, real and imaginary parts) of the given waves, e.g. ["S0+", "D2+"]
+    return np.array([amp.split("::")[2] in waves for amp in covariance["amplitudes"]])
+
+def get_parameter_map(covariance, index_key):
+    # (amplitudes, parameters) matrix summing the derivative of every amplitude into the parameter it depends on,
+    # constrained amplitudes share a parameter and fixed ones have none
+    mapping = np.zeros((len(covariance["amplitudes"]), len(covariance["parameters"])))
+    indices = covariance[index_key]
+    has_parameter = indices >= 0
+    mapping[np.nonzero(has_parameter)[0], indices[has_parameter]] = 1.0
+    return mapping
+
+def propagate(covariance, jacobian_re, jacobian_im):
+    # variance of a quantity from its derivatives by the real and imaginary part of every amplitude, for every fit
+    jacobian = jacobian_re @ get_parameter_map(covariance, "re_index") + jacobian_im @ get_parameter_map(covariance, "im_index")
+    return np.einsum('fp,fpq,fq->f', jacobian, covariance["covariance"], jacobian)
+
+def intensity(covariance, waves, acc_corrected=True):
+    """
+    Coherent intensity of the given waves and its error for every fit at once.
+
+    Returns (values, errors), arrays ordered like covariance["Bin"] and covariance["Iteration"].
+    """
+    return amplitude_intensity(covariance, get_wave_mask(covariance, waves), acc_corrected)
+
+def amplitude_intensity(covariance, mask, acc_corrected=True):
+    # coherent intensity of the amplitudes selected by a boolean mask
+    integrals = covariance["amp_int"] if acc_corrected else covariance["norm_int"]
+    production = covariance["production"] * mask
+    scales = covariance["scales"] * mask
+    values = np.real(np.einsum('fi,fj,fij->f', production, np.conj(production), integrals))
+    # dI/dV_k and dI/dV_k* contributions, V_k = scale_k * (re_k + i im_k)
+    row_sums = np.einsum('fj,fkj->fk', np.conj(production), integrals)
+    column_sums = np.einsum('fi,fik->fk', production, integrals)
+    jacobian_re = scales * np.real(row_sums + column_sums)
+    jacobian_im = scales * np.real(1j * row_sums - 1j * column_sums)
+    return values, np.sqrt(propagate(covariance, jacobian_re, jacobian_im))
+
+def phase_difference(covariance, wave1, wave2):
+    # arg(V1) - arg(V2) of the first real-part amplitude of each wave and its error for every fit, in radians
+    amplitudes = list(covariance["amplitudes"])
+    index1 = [i for i, amp in enumerate(amplitudes) if amp.split("::")[2] == wave1 and amp.split("::")[1].endswith("Re")][0]
+    index2 = [i for i, amp in enumerate(amplitudes) if amp.split("::")[2] == wave2 and amp.split("::")[1].endswith("Re")][0]
+    return amplitude_phase_difference(covariance, index1, index2)
+
+def amplitude_phase_difference(covariance, index1, index2):
+    # arg(V1) - arg(V2) of the amplitudes at the given indices
+    production = covariance["production"]
+    values = np.angle(production[:, index1]) - np.angle(production[:, index2])
+    jacobian_re = np.zeros(production.shape)
+    jacobian_im = np.zeros(production.shape)
+    for index, sign in ((index1, 1.0), (index2, -1.0)):
+        # d arg(V) / d re = -im / |V|^2, d arg(V) / d im = re / |V|^2, independent of the (positive) scale
+        raw = production[:, index] / covariance["scales"][:, index]
+        norm = np.abs(raw)**2
+        jacobian_re[:, index] = sign * -np.imag(raw) / norm
+        jacobian_im[:, index] = sign * np.real(raw) / norm
+    return values, np.sqrt(propagate(covariance, jacobian_re, jacobian_im))
@@ -0,0 +1,133 @@
+import json
+import traceback
+from itertools import combinations
+from pathlib import Path
+from amppy.fitresults.Covariance import write_covariance
+from amppy.fitresults.FitFile import open_fit_file
+from amppy.configs import load_config
+
+def get_spec_path(config_template):
+    # <root>/<config>::extraction.json, shared by fits and bootstrap fits of a config
+    config_template = Path(config_template)
+    return config_template.parent / f"{config_template.stem}::extraction.json"
+
+class ExtractionSpec():
+    """
+    The quantities extracted from every fit and the result columns they fill.
+
+    intensities maps a column name to the waves summed in that intensity, production lists the
+    waves whose production parameter is stored and phases lists pairs of waves.
+    """
+
+    def __init__(self, intensities, production, phases):
+        self.intensities = dict(intensities)
+        self.production = list(production)
+        self.phases = [tuple(pair) for pair in phases]
+
+    @staticmethod
+    def from_config(config):
+        # the default columns: every wave's intensity and production parameter, and the phases between waves in the same sum
+        re_amps = [amp.split("::") for amp in load_config(config).amplitudes if amp.split("::")[1].endswith("Re")]
+        intensities = {parts[2]: [parts[2]] for parts in re_amps}
+        production = [parts[2] for parts in re_amps]
+        phases = [(parts1[2], parts2[2]) for parts1, parts2 in combinations(re_amps, 2) if parts1[1] == parts2[1]]
+        return ExtractionSpec(intensities, production, phases)
+
+    @staticmethod
+    def from_json(path):
+        # {"intensities": {"name": ["wave", ...]}, "production": ["wave", ...], "phases": [["wave1", "wave2"], ...]}
+        with open(path, 'r') as spec_file:
+            spec = json.load(spec_file)
+        return ExtractionSpec(spec.get("intensities", {}), spec.get("production", []), spec.get("phases", []))
+
+    def to_json(self, path):
+        with open(path, 'w') as spec_file:
+            json.dump({"intensities": self.intensities,
+                       "production": self.production,
+                       "phases": [list(pair) for pair in self.phases]}, spec_file, indent=4)
+
+    def extend(self, other):
+        # this spec's columns followed by any new ones from other
+        intensities = dict(self.intensities)
+        intensities.update({name: waves for name, waves in other.intensities.items() if name not in intensities})
+        production = self.production + [wave for wave in other.production if wave not in self.production]
+        phases = self.phases + [pair for pair in other.phases if pair not in self.phases]
+        return ExtractionSpec(intensities, production, phases)
+
+
+    def headers(self):
+        headers = []
+        for name in self.intensities:
+            headers.extend([name + "_NC_INT", name + "_NC_INT_err", name + "_AC_INT", name + "_AC_INT_err"])
+        for wave in self.production:
+            headers.append(wave + "_AMP")
+        for wave1, wave2 in self.phases:
+            headers.extend([wave1 + "_" + wave2 + "_PHASE", wave1 + "_" + wave2 + "_PHASE_err"])
+        headers.extend(["total_NC_INT", "total_NC_INT_err", "total_AC_INT", "total_AC_INT_err", "likelihood"])
+        return headers
+
+    def requests(self, amplitudes, polarizations):
+        # the amplitude names FitResults is asked about, for a config's amplitudes and polarizations
+        waves = {}
+        for amp in amplitudes:
+            parts = amp.split("::")
+            if parts[1].endswith("Re"):
+                waves[parts[2]] = parts
+        for wave in set(sum(self.intensities.values(), [])) | set(self.production) | set(sum(map(list, self.phases), [])):
+            if wave not in waves:
+                raise ValueError(f"Wave {wave} is not an amplitude of this config")
+        first_pol_name = lambda parts: parts[0] + polarizations[0] + "::" + parts[1] + "::" + parts[2]
+        intensity_groups = []
+        for name, group in self.intensities.items():
+            amps = []
+            for wave in group:
+                parts = waves[wave]
+                for pol in polarizations:
+                    amps.append(parts[0] + pol + "::" + parts[1] + "::" + parts[2])
+                    amps.append(parts[0] + pol + "::" + parts[1].replace("Re", "Im") + "::" + parts[2])
+            intensity_groups.append(amps)
+        phase_pairs = [(first_pol_name(waves[wave1]), first_pol_name(waves[wave2])) for wave1, wave2 in self.phases]
+        production_parameters = [first_pol_name(waves[wave]) for wave in self.production]
+        return intensity_groups, phase_pairs, production_parameters
+
+    def extract(self, fit, config):
+        # values of one fit (an open FitResultsWrapper or FitFile) in the order of headers()
+        config = load_config(config)
+        intensities, phases, production, totals, likelihood = fit.batch(*self.requests(config.amplitudes, config.polarizations))
+        values = list(intensities.reshape(-1))
+        values.extend(production)
+        values.extend(phases.reshape(-1))
+        values.extend(totals.reshape(-1))
+        values.append(likelihood)
+        return values
+
+
+def load_spec(config_template):
+    # the spec saved by the last extraction, or the default one for the config
+    spec_path = get_spec_path(config_template)
+    if spec_path.exists():
+        return ExtractionSpec.from_json(spec_path)
+    return ExtractionSpec.from_config(config_template)
+
+def write_fit_results(path, bin_n, iteration, convergence, values):
+    # the one-line per-fit results file, empty unless the fit converged or hit the call limit
+    with open(path, 'w') as out_file:
+        if convergence == 'C' or convergence == 'L':
+            output = "\t".join([str(itm) for itm in values])
+            out_file.write(f"{bin_n}\t{iteration}\t{convergence}\t{output}\n")
+
+
+def run_extraction(tup):
+    # process pool worker, rewrites one fit's results and covariance files from its .fit file
+    spec, fit_file, config, results_file, covariance_file, bin_n, iteration, convergence, drop_stale = tup
+    try:
+        fit = open_fit_file(fit_file, config)
+        write_fit_results(results_file, bin_n, iteration, convergence, spec.extract(fit, config))
+        write_covariance(fit, covariance_file)
+        return True
+    except Exception:
+        traceback.print_exc()
+        if drop_stale:
+            # the previous line has the old columns, gather skips the fit until it is extracted again
+            Path(results_file).unlink(missing_ok=True)
+        return False
@@ -0,0 +1,194 @@
+from pathlib import Path
+import numpy as np
+from amppy.fitresults import FitResults
+from amppy.fitresults.Covariance import amplitude_intensity, amplitude_phase_difference
+from amppy.configs import load_config
+
+COMPLEX_TRANSLATION = str.maketrans("(),", "   ")
+
+def parse_complex_matrix(lines, n):
+    # n rows of "(re,im)" tokens
+    values = np.array(" ".join(lines).translate(COMPLEX_TRANSLATION).split(), dtype=np.float64)
+    return values.view(np.complex128).reshape(n, n)
+
+
+class FitFile():
+    """
+    Reader for the .fit files written by AmpTools' FitResults::writeResults which needs neither ROOT nor AmpTools.
+
+    Provides the same methods as FitResultsWrapper. Amplitudes constrained to each other share one pair
+    of fit parameters named after one of them, pass the fit's config to resolve which.
+    """
+
+    def __init__(self, path, config=None):
+        self.path = Path(path)
+        self.reactions = []
+        self.amplitudes = {} # reaction -> [amplitude]
+        self.scales = {} # amplitude -> scale value
+        self.likelihood_total = None
+        self.fitter_info = {}
+        self.norm_ints = {} # reaction -> (amplitude names, generated MC integrals, accepted MC integrals)
+        self.parameters = []
+        self.values = None
+        self.error_matrix = None
+        self._covariance = None
+        self.read()
+        self.parameter_index = {name: index for index, name in enumerate(self.parameters)}
+        self.constraint_groups = load_config(config).get_constraint_groups() if config != None else {}
+
+    def read(self):
+        with open(self.path, 'r') as fit_file:
+            sections = {}
+            section = None
+            for line in fit_file:
+                if line.startswith("+++"):
+                    section = line.strip("+ \n")
+                    sections[section] = []
+                elif section != None and line.strip():
+                    sections[section].append(line)
+        self.read_amplitudes(sections["Reactions, Amplitudes, and Scale Parameters"])
+        self.read_likelihood(sections["Likelihood Total and Partial Sums"])
+        self.read_fitter_info(sections["Fitter Information"])
+        self.read_norm_ints(sections["Normalization Integrals"])
+        self.read_parameters(sections["Parameter Values and Errors"])
+
+    def read_amplitudes(self, lines):
+        lines = iter(lines)
+        for _ in range(int(next(lines))):
+            reaction, n_amps = next(lines).split()
+            self.reactions.append(reaction)
+            self.amplitudes[reaction] = []
+            for _ in range(int(n_amps)):
+                line_parts = next(lines).split()
+                self.amplitudes[reaction].append(line_parts[0])
+                self.scales[line_parts[0]] = float(line_parts[-1])
+
+    def read_likelihood(self, lines):
+        self.likelihood_total = float(lines[0])
+
+    def read_fitter_info(self, lines):
+        for line in lines:
+            name, value = line.split()
+            self.fitter_info[name] = float(value)
+
+    def read_norm_ints(self, lines):
+        # per reaction: name, "<generated events> <accepted events>", number of amplitudes, the amplitude names,
+        # then the generated (ampInt) and accepted (normInt) integral matrices one row per line
+        position = 0
+        for reaction in self.reactions:
+            position += 2 # reaction name, event counts
+            n_amps = int(lines[position])
+            names = [line.strip() for line in lines[position + 1:position + 1 + n_amps]]
+            position += 1 + n_amps
+            amp_int = parse_complex_matrix(lines[position:position + n_amps], n_amps)
+            norm_int = parse_complex_matrix(lines[position + n_amps:position + 2 * n_amps], n_amps)
+            position += 2 * n_amps
+            self.norm_ints[reaction] = (names, amp_int, norm_int)
+
+    def read_parameters(self, lines):
+        n_pars = int(lines[0])
+        names_values = [line.split() for line in lines[1:1 + n_pars]]
+        self.parameters = [name for name, _ in names_values]
+        self.values = np.array([value for _, value in names_values], dtype=np.float64)
+        self.error_matrix = np.array(" ".join(lines[1 + n_pars:1 + 2 * n_pars]).split(), dtype=np.float64).reshape(n_pars, n_pars)
+
+
+    def ampList(self):
+        return [amp for reaction in self.reactions for amp in self.amplitudes[reaction]]
+
+    def parNameList(self):
+        return list(self.parameters)
+
+    def parValueList(self):
+        return list(self.values)
+
+    def errorMatrix(self):
+        return self.error_matrix
+
+    def prodParName(self, amplitude, part):
+        for amp in self.constraint_groups.get(amplitude, [amplitude]):
+            if amp + part in self.parameter_index:
+                return amp + part
+        return amplitude + part
+
+    def realProdParName(self, amplitude):
+        return self.prodParName(amplitude, "_re")
+
+    def imagProdParName(self, amplitude):
+        return self.prodParName(amplitude, "_im")
+
+    def productionParameter(self, amp):
+        # amplitudes constrained to be real have no imaginary parameter
+        re_index = self.parameter_index.get(self.realProdParName(amp))
+        im_index = self.parameter_index.get(self.imagProdParName(amp))
+        if re_index == None:
+            raise KeyError(f"No production parameter for amplitude {amp}")
+        return complex(self.values[re_index], self.values[im_index] if im_index != None else 0.0)
+
+    def scaledProductionParameter(self, amp):
+        return self.productionParameter(amp) * self.scales[amp]
+
+    def likelihood(self):
+        return self.likelihood_total
+
+    def covariance(self):
+        # same arrays as FitResultsWrapper.covariance
+        amplitudes = self.ampList()
+        n_amps = len(amplitudes)
+        norm_int = np.zeros((n_amps, n_amps), dtype=np.complex128)
+        amp_int = np.zeros((n_amps, n_amps), dtype=np.complex128)
+        offset = 0
+        for reaction in self.reactions:
+            names, reaction_amp_int, reaction_norm_int = self.norm_ints[reaction]
+            order = [names.index(amp) for amp in self.amplitudes[reaction]]
+            n_reaction = len(order)
+            amp_int[offset:offset + n_reaction, offset:offset + n_reaction] = reaction_amp_int[np.ix_(order, order)]
+            norm_int[offset:offset + n_reaction, offset:offset + n_reaction] = reaction_norm_int[np.ix_(order, order)]
+            offset += n_reaction
+        return {"amplitudes": np.array(amplitudes),
+                "production": np.array([self.scaledProductionParameter(amp) for amp in amplitudes], dtype=np.complex128),
+                "scales": np.array([self.scales[amp] for amp in amplitudes], dtype=np.float64),
+                "parameters": np.array(self.parameters),
+                "values": self.values,
+                "covariance": self.error_matrix,
+                "re_index": np.array([self.parameter_index.get(self.realProdParName(amp), -1) for amp in amplitudes], dtype=np.int64),
+                "im_index": np.array([self.parameter_index.get(self.imagProdParName(amp), -1) for amp in amplitudes], dtype=np.int64),
+                "norm_int": norm_int,
+                "amp_int": amp_int}
+
+    def get_covariance(self):
+        # covariance() with a leading fit axis of length one, as used by the Covariance module
+        if self._covariance == None:
+            self._covariance = {key: (value[np.newaxis] if key not in ("amplitudes", "parameters", "re_index", "im_index") else value)
+                                for key, value in self.covariance().items()}
+        return self._covariance
+
+    def intensity(self, amps, acc):
+        covariance = self.get_covariance()
+        value, error = amplitude_intensity(covariance, np.isin(covariance["amplitudes"], amps), acc)
+        return value[0], error[0]
+
+    def total_intensity(self, acc):
+        covariance = self.get_covariance()
+        value, error = amplitude_intensity(covariance, np.ones(len(covariance["amplitudes"]), dtype=bool), acc)
+        return value[0], error[0]
+
+    def phaseDiff(self, amp1, amp2):
+        amplitudes = list(self.get_covariance()["amplitudes"])
+        value, error = amplitude_phase_difference(self.get_covariance(), amplitudes.index(amp1), amplitudes.index(amp2))
+        return value[0], error[0]
+
+    def batch(self, intensity_groups, phase_pairs, production_parameters):
+        # same layout as FitResultsWrapper.batch
+        intensities = np.array([[self.intensity(amps, False), self.intensity(amps, True)] for amps in intensity_groups], dtype=np.float64).reshape(-1, 2, 2)
+        phases = np.array([self.phaseDiff(amp1, amp2) for amp1, amp2 in phase_pairs], dtype=np.float64).reshape(-1, 2)
+        production = np.array([self.productionParameter(amp) for amp in production_parameters], dtype=np.complex128)
+        totals = np.array([self.total_intensity(False), self.total_intensity(True)], dtype=np.float64)
+        return intensities, phases, production, totals, self.likelihood()
+
+
+def open_fit_file(path, config=None):
+    # the compiled AmpTools reader if it was built, otherwise the NumPy one
+    if FitResults != None:
+        return FitResults.FitResultsWrapper(str(path))
+    return FitFile(path, config)
@@ -5,8 +5,16 @@ from libcpp.string cimport string
 from libcpp.complex cimport complex
 import os
 import sys
+import numpy as np
 from contextlib import contextmanager
 
+cdef extern from "IUAmpTools/NormIntInterface.h":
+    cdef cppclass NormIntInterface:
+        complex[double] normInt(string amp, string conjAmp, bint forceUseCache) const
+        complex[double] ampInt(string amp, string conjAmp, bint forceUseCache) const
+        void forceCacheUpdate(bint normIntOnly) const
+        void exportNormIntCache(const string& fileName, bint renormalize) const
+
 cdef extern from "FitResults.h":
     cdef cppclass FitResults:
         FitResults(const string& inFile)
@@ -16,6 +24,73 @@ cdef extern from "FitResults.h":
         pair[double, double] phaseDiff(string& amp1, string& amp2)
         complex[double] productionParameter(string& ampName)
         vector[string] ampList()
+        vector[string] reactionAmpList "ampList"(const string& reaction)
+        vector[string] reactionList()
+        complex[double] scaledProductionParameter(const string& ampName)
+        vector[string] parNameList()
+        vector[double] parValueList()
+        vector[vector[double]] errorMatrix()
+        string realProdParName(const string& amplitude)
+        string imagProdParName(const string& amplitude)
+        const NormIntInterface* normInt(const string& reactionName)
+
+cdef extern from "IUAmpTools/Amplitude.h":
+    cdef cppclass Amplitude:
+        pass
+
+cdef extern from "IUAmpTools/DataReader.h":
+    cdef cppclass DataReader:
+        pass
+
+cdef extern from "AMPTOOLS_AMPS/Zlm.h":
+    cdef cppclass Zlm(Amplitude):
+        Zlm()
+
+cdef extern from "AMPTOOLS_DATAIO/ROOTDataReader.h":
+    cdef cppclass ROOTDataReader(DataReader):
+        ROOTDataReader()
+
+cdef extern from "AMPTOOLS_DATAIO/ROOTDataReaderBootstrap.h":
+    cdef cppclass ROOTDataReaderBootstrap(DataReader):
+        ROOTDataReaderBootstrap()
+
+cdef extern from "IUAmpTools/ConfigurationInfo.h":
+    cdef cppclass ReactionInfo:
+        string reactionName()
+        string normIntFile()
+    cdef cppclass ConfigurationInfo:
+        vector[ReactionInfo*] reactionList()
+
+cdef extern from "IUAmpTools/ConfigFileParser.h":
+    cdef cppclass ConfigFileParser:
+        ConfigFileParser(const string& configFile)
+        ConfigurationInfo* getConfigurationInfo()
+
+cdef extern from "IUAmpTools/ParameterManager.h":
+    cdef cppclass ParameterManager:
+        void setProductionParameter(const string& termName, complex[double] prodPar)
+
+cdef extern from "MinuitInterface/MinuitMinimizationManager.h":
+    cdef cppclass MinuitMinimizationManager:
+        void setStrategy(int strategy)
+        void setMaxIterations(int maxIter)
+        unsigned int numFunctionCalls()
+        void migradMinimization()
+        int status()
+        int eMatrixStatus()
+
+cdef extern from "IUAmpTools/AmpToolsInterface.h":
+    cdef cppclass AmpToolsInterface:
+        AmpToolsInterface(ConfigurationInfo* cfgInfo)
+        @staticmethod
+        void registerAmplitude(const Amplitude& defaultAmplitude)
+        @staticmethod
+        void registerDataReader(const DataReader& defaultDataReader)
+        void reinitializePars()
+        ParameterManager* parameterManager()
+        MinuitMinimizationManager* minuitMinimizationManager()
+        NormIntInterface* normIntInterface(const string& reactionName)
+        void finalizeFit()
 
 cdef class CyFitResults:
     cdef FitResults *cobj
@@ -46,6 +121,157 @@ cdef class CyFitResults:
     def ampList(self):
         return self.cobj.ampList()
 
+    def batch(self, vector[vector[string]] intensityGroups, vector[pair[string, string]] phasePairs, vector[string] prodPars):
+        # every quantity Fitter extracts in a single pass, without converting each result back to Python
+        # intensities[group, accCorrected] and phases[pair] are (value, error) pairs, totals[accCorrected] likewise
+        intensities = np.empty((intensityGroups.size(), 2, 2), dtype=np.float64)
+        phases = np.empty((phasePairs.size(), 2), dtype=np.float64)
+        production = np.empty(prodPars.size(), dtype=np.complex128)
+        totals = np.empty((2, 2), dtype=np.float64)
+        cdef double[:, :, ::1] intensities_view = intensities
+        cdef double[:, ::1] phases_view = phases
+        cdef double complex[::1] production_view = production
+        cdef double[:, ::1] totals_view = totals
+        cdef pair[double, double] result
+        cdef complex[double] par
+        cdef size_t i
+        cdef int acc
+        for i in range(intensityGroups.size()):
+            for acc in range(2):
+                result = self.cobj.intensity(intensityGroups[i], acc)
+                intensities_view[i, acc, 0] = result.first
+                intensities_view[i, acc, 1] = result.second
+        for i in range(phasePairs.size()):
+            result = self.cobj.phaseDiff(phasePairs[i].first, phasePairs[i].second)
+            phases_view[i, 0] = result.first
+            phases_view[i, 1] = result.second
+        for i in range(prodPars.size()):
+            par = self.cobj.productionParameter(prodPars[i])
+            production_view[i] = par.real() + 1j * par.imag()
+        for acc in range(2):
+            result = self.cobj.total_intensity(acc)
+            totals_view[acc, 0] = result.first
+            totals_view[acc, 1] = result.second
+        return intensities, phases, production, totals, self.cobj.likelihood()
+
+    def covariance(self):
+        # production parameters, their covariance and the normalization integrals of every amplitude,
+        # integrals between amplitudes of different reactions are zero
+        cdef const NormIntInterface *ni
+        cdef complex[double] scaled
+        cdef complex[double] raw
+        cdef complex[double] integral
+        cdef size_t offset = 0
+        amplitudes = []
+        for reaction in self.cobj.reactionList():
+            amplitudes.extend(self.cobj.reactionAmpList(reaction))
+        n_amps = len(amplitudes)
+        production = np.zeros(n_amps, dtype=np.complex128)
+        scales = np.ones(n_amps, dtype=np.float64)
+        norm_int = np.zeros((n_amps, n_amps), dtype=np.complex128)
+        amp_int = np.zeros((n_amps, n_amps), dtype=np.complex128)
+        parameters = list(self.cobj.parNameList())
+        parameter_index = {name: index for index, name in enumerate(parameters)}
+        re_index = np.full(n_amps, -1, dtype=np.int64)
+        im_index = np.full(n_amps, -1, dtype=np.int64)
+        for reaction in self.cobj.reactionList():
+            reaction_amps = list(self.cobj.reactionAmpList(reaction))
+            ni = self.cobj.normInt(reaction)
+            for i, amp in enumerate(reaction_amps):
+                scaled = self.cobj.scaledProductionParameter(amp)
+                raw = self.cobj.productionParameter(amp)
+                production[offset + i] = scaled.real() + 1j * scaled.imag()
+                if raw.real() != 0 or raw.imag() != 0:
+                    scales[offset + i] = abs((scaled.real() + 1j * scaled.imag()) / (raw.real() + 1j * raw.imag()))
+                re_index[offset + i] = parameter_index.get(self.cobj.realProdParName(amp), -1)
+                im_index[offset + i] = parameter_index.get(self.cobj.imagProdParName(amp), -1)
+                for j, conj_amp in enumerate(reaction_amps):
+                    integral = ni.normInt(amp, conj_amp, False)
+                    norm_int[offset + i, offset + j] = integral.real() + 1j * integral.imag()
+                    integral = ni.ampInt(amp, conj_amp, False)
+                    amp_int[offset + i, offset + j] = integral.real() + 1j * integral.imag()
+            offset += len(reaction_amps)
+        return {"amplitudes": np.array([amp.decode('utf-8') for amp in amplitudes]),
+                "production": production,
+                "scales": scales,
+                "parameters": np.array([name.decode('utf-8') for name in parameters]),
+                "values": np.array(self.cobj.parValueList(), dtype=np.float64),
+                "covariance": np.array(self.cobj.errorMatrix(), dtype=np.float64),
+                "re_index": re_index,
+                "im_index": im_index,
+                "norm_int": norm_int,
+                "amp_int": amp_int}
+
+
+cdef bint amptools_registered = False
+
+cdef register_amptools():
+    # same amplitudes and data readers that halld_sim's fit executable registers for AmpPy configs
+    global amptools_registered
+    cdef Zlm zlm
+    cdef ROOTDataReader reader
+    cdef ROOTDataReaderBootstrap bootstrap_reader
+    if not amptools_registered:
+        AmpToolsInterface.registerAmplitude(zlm)
+        AmpToolsInterface.registerDataReader(reader)
+        AmpToolsInterface.registerDataReader(bootstrap_reader)
+        amptools_registered = True
+
+cdef class CyAmpToolsFitter:
+    """
+    Holds one AmpToolsInterface so the data, accepted MC and generated MC of a
+    bin are read once and can be minimized repeatedly from different starts.
+    """
+    cdef ConfigFileParser *parser
+    cdef AmpToolsInterface *ati
+
+    def __init__(self, string configFileStr):
+        register_amptools()
+        self.parser = new ConfigFileParser(configFileStr)
+        if self.parser == NULL:
+            raise MemoryError('Not enough memory.')
+        self.ati = new AmpToolsInterface(self.parser.getConfigurationInfo())
+        if self.ati == NULL:
+            raise MemoryError('Not enough memory.')
+
+    def __dealloc__(self):
+        del self.ati
+        del self.parser
+
+    def fit(self, starts, int max_calls):
+        # starts maps production amplitude names to complex starting values,
+        # the resulting <fit name>.fit is written to the current directory
+        self.ati.reinitializePars()
+        for name, value in starts.items():
+            self.ati.parameterManager().setProductionParameter(name, value)
+        cdef MinuitMinimizationManager *manager = self.ati.minuitMinimizationManager()
+        manager.setStrategy(1)
+        manager.setMaxIterations(max_calls)
+        calls_before = manager.numFunctionCalls() # the count runs on over every fit of this interface
+        manager.migradMinimization()
+        status = manager.status()
+        ematrix_status = manager.eMatrixStatus()
+        n_calls = manager.numFunctionCalls() - calls_before
+        self.ati.finalizeFit()
+        return status, ematrix_status, n_calls
+
+cdef cy_export_normints(string configFileStr):
+    # computes the normalization integrals of every reaction and writes them to the reaction's normintfile
+    register_amptools()
+    cdef ConfigFileParser *parser = new ConfigFileParser(configFileStr)
+    cdef ConfigurationInfo *cfgInfo = parser.getConfigurationInfo()
+    cdef AmpToolsInterface *ati = new AmpToolsInterface(cfgInfo)
+    cdef NormIntInterface *ni
+    cdef ReactionInfo *reaction
+    try:
+        for reaction in cfgInfo.reactionList():
+            ni = ati.normIntInterface(reaction.reactionName())
+            ni.forceCacheUpdate(False)
+            ni.exportNormIntCache(reaction.normIntFile(), False)
+    finally:
+        del ati
+        del parser
+
 
 @contextmanager
 def stdout_redirected(to=os.devnull):
@@ -106,3 +332,29 @@ class FitResultsWrapper:
     def ampList(self):
         with stdout_redirected():
             return self.fitobj.ampList()
+
+    def covariance(self):
+        with stdout_redirected():
+            return self.fitobj.covariance()
+
+    def batch(self, intensity_groups, phase_pairs, production_parameters):
+        # one stdout redirect for the whole extraction, see CyFitResults.batch for the layout of the arrays
+        with stdout_redirected():
+            return self.fitobj.batch([[amp.encode('utf-8') for amp in amps] for amps in intensity_groups],
+                                     [(amp1.encode('utf-8'), amp2.encode('utf-8')) for amp1, amp2 in phase_pairs],
+                                     [amp.encode('utf-8') for amp in production_parameters])
+
+
+def export_normints(configFileStr):
+    with stdout_redirected():
+        cy_export_normints(configFileStr.encode('utf-8'))
+
+
+class AmpToolsFitterWrapper:
+    def __init__(self, configFileStr):
+        with stdout_redirected():
+            self.fitterobj = CyAmpToolsFitter(configFileStr.encode('utf-8'))
+
+    def fit(self, starts, max_calls):
+        with stdout_redirected():
+            return self.fitterobj.fit({name.encode('utf-8'): value for name, value in starts.items()}, max_calls)
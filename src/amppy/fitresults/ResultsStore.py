@@ -0,0 +1,53 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+INDEX_COLUMNS = ["Bin", "Iteration", "Convergence"]
+
+def get_results_path(config_template, bootstrap=False, suffix=".parquet"):
+    # <root>/<config>::fit_results.parquet or <root>/<config>_bootstrap::fit_results.parquet
+    config_template = Path(config_template)
+    tag = "_bootstrap" if bootstrap else ""
+    return config_template.parent / f"{config_template.stem}{tag}::fit_results{suffix}"
+
+def results_exist(config_template, bootstrap=False):
+    return get_results_path(config_template, bootstrap).exists() or get_results_path(config_template, bootstrap, ".txt").exists()
+
+
+def split_amplitude_columns(df):
+    # replaces complex (or complex-string) "_AMP" columns by float64 "_AMP_re" and "_AMP_im" columns
+    for col in [col for col in df.columns if col.endswith("_AMP")]:
+        values = df[col].astype('complex').to_numpy()
+        position = df.columns.get_loc(col)
+        df = df.drop(columns=col)
+        df.insert(position, col + "_im", np.imag(values))
+        df.insert(position, col + "_re", np.real(values))
+    return df
+
+def parse_results_lines(lines, headers):
+    # lines are the tab-separated rows written by Fitter.fit, headers excludes INDEX_COLUMNS
+    columns = INDEX_COLUMNS + headers
+    rows = [line.rstrip("\n").split("\t") for line in lines]
+    df = pd.DataFrame(rows, columns=columns)
+    df = df.astype({col: 'float64' for col in headers if not col.endswith("_AMP")})
+    df = df.astype({"Bin": 'int32', "Iteration": 'int32', "Convergence": 'category'})
+    return split_amplitude_columns(df)
+
+
+def write_results(df, path):
+    df.to_parquet(str(path), index=False)
+
+def read_results(config_template, bootstrap=False, columns=None):
+    """
+    Read gathered fit results for a config, only loading the requested columns.
+
+    Falls back to the tab-separated format written before the columnar store existed.
+    """
+    path = get_results_path(config_template, bootstrap)
+    if path.exists():
+        return pd.read_parquet(str(path), columns=columns)
+    df = pd.read_csv(get_results_path(config_template, bootstrap, ".txt"), delimiter="\t", index_col=False)
+    df = split_amplitude_columns(df)
+    if columns != None:
+        df = df[columns]
+    return df
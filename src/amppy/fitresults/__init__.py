@@ -1 +1,4 @@
-import FitResults
+try:
+    import FitResults
+except ImportError: # the compiled AmpTools extension is only needed for in-process fits and precomputed integrals, FitFile reads .fit files without it
+    FitResults = None
@@ -6,6 +6,8 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 from halo import Halo
+from amppy.fitresults.ResultsStore import get_results_path, read_results, results_exist
+from amppy.dividers.BinInfo import BinInfo, get_bin_info_path
 
 class Plotter(ABC):
     pdf = None
@@ -16,45 +18,37 @@ class Plotter(ABC):
         self.ylabel = "" 
         self.title = ""
         self.config_template = Path(config).resolve()
-        self.fit_results = self.config_template.parent / (self.config_template.stem + "::fit_results.txt")
-        self.bin_info = self.config_template.parent / 'bin_info.txt'
-        self.bootstrap = self.config_template.parent / (self.config_template.stem + "_bootstrap::fit_results.txt")
+        self.fit_results = get_results_path(self.config_template)
+        self.bin_info = BinInfo.read(get_bin_info_path(self.config_template.parent))
+        self.bootstrap = get_results_path(self.config_template, bootstrap=True)
         self.fit_df = None
         self.best_fit_df = None
-        ### Fit DataFrame
-        self.fit_df = pd.read_csv(self.fit_results, delimiter='\t', index_col=False)
-        amp_typing = {col: 'complex' for col in self.fit_df.columns if "AMP" in col}
-        self.fit_df = self.fit_df.astype(amp_typing)
-        amp_agg = {col: [np.real, np.imag] for col in amp_typing}
-        amp_names = [col + tag for col in amp_typing for tag in ["_re", "_im"]]
-        self.fit_df[amp_names] = self.fit_df.agg(amp_agg)
+        ### Fit DataFrame (amplitudes are stored as float "_AMP_re" and "_AMP_im" columns)
+        self.fit_df = read_results(self.config_template)
         self.fit_df['nlikelihood'] = self.fit_df['likelihood'].to_numpy() / self.fit_df['total_AC_INT'].to_numpy()
         ### Best Fit DataFrame
         self.best_fit_df = self.fit_df.loc[self.fit_df.groupby(['Bin'])['likelihood'].idxmax()]
-        ### Bin Info DataFrame (columns = "bin=#,#" and "mass"/"t" etc)
-        self.bin_info_df = pd.read_csv(self.bin_info, delimiter='\t')
-        self.bin_type = self.bin_info_df.columns.to_list()[1] # e.g. "mass=GeV/$c^2$"
-        self.bin_unit = self.bin_type.split("=")[1] # e.g. "GeV/$c^2$"
-        bin_edge_low, bin_edge_high = [float(val) for val in self.bin_info_df.columns.to_list()[0].split('=')[1].split(',')]
-        self.nbins = len(self.bin_info_df) # number of bins
-        self.bin_centers = self.bin_info_df[self.bin_type].to_list() # values of bin centers
+        ### Bin Info DataFrame (columns = "mass=GeV/$c^2$" etc with the center of each bin along the first axis, "Fit" and "Label")
+        ### plots are drawn along the first axis, once for every bin of any other axes (see plot)
+        bin_name, self.bin_unit, first_edges = self.bin_info.axes[0]
+        self.bin_type = f"{bin_name}={self.bin_unit}" # e.g. "mass=GeV/$c^2$"
+        self.nbins = self.bin_info.n_bins # number of bins
+        self.bin_centers = [self.bin_info.get_center(bin_n) for bin_n in range(self.nbins)] # values of bin centers
+        self.bin_info_df = pd.DataFrame({self.bin_type: self.bin_centers})
         self.fit_df['Center'] = self.bin_info_df[self.bin_type].iloc[self.fit_df['Bin']].to_list()
         self.best_fit_df['Center'] = self.bin_info_df[self.bin_type].iloc[self.best_fit_df['Bin']].to_list()
         self.bin_info_df['Fit'] = [bin_n in self.best_fit_df['Bin'] for bin_n in range(self.nbins)] # bool array, true if a fit converged
-        self.bin_width = (bin_edge_high - bin_edge_low) / self.nbins # bin width
-        self.bin_edges = [bin_edge_low + n * self.bin_width for n in range(self.nbins + 1)] # bin edges (len = nbins+1)
-        self.bin_info_df['Label'] = [f"({round(low_edge, 3)} - {round(high_edge, 3)}) {self.bin_unit}" for low_edge, high_edge in zip(self.bin_edges[:-1], self.bin_edges[1:])]
+        self.bin_width = first_edges[1] - first_edges[0] # width of the first bin, see get_bin_width for bins of different widths
+        self.bin_edges = list(first_edges) # bin edges along the first axis (len = bins per slice + 1)
+        self.bin_info_df['Label'] = [self.bin_info.get_label(bin_n) for bin_n in range(self.nbins)]
+        self.slice_bins = list(range(self.nbins))
+        self.slice_label = ""
         ### list whose n-th element is a DataFrame with all converged fits in the n-th bin
         self.fits_in_bin = [self.fit_df.loc[self.fit_df['Bin'] == bin_num] for bin_num in range(self.nbins)]
         self.bootstrap_df = None
         self.bootstrapped = False
-        if self.bootstrap.exists():
-            self.bootstrap_df = pd.read_csv(self.bootstrap, delimiter='\t', index_col=False)
-            amp_typing = {col: 'complex' for col in self.bootstrap_df.columns if "AMP" in col}
-            self.bootstrap_df = self.bootstrap_df.astype(amp_typing)
-            amp_agg = {col: [np.real, np.imag] for col in amp_typing}
-            amp_names = [col + tag for col in amp_typing for tag in ["_re", "_im"]]
-            self.bootstrap_df[amp_names] = self.bootstrap_df.agg(amp_agg)
+        if results_exist(self.config_template, bootstrap=True):
+            self.bootstrap_df = read_results(self.config_template, bootstrap=True)
             self.bootstrap_df['Center'] = self.bin_info_df[self.bin_type].iloc[self.bootstrap_df['Bin']].to_list()
             self.bootstrapped = True
         wave_letters = ['S', 'P', 'D', 'F', 'G']
@@ -122,6 +116,27 @@ class Plotter(ABC):
     def configure(kwdict):
         pass
 
-    @abstractmethod
+    def get_bin_width(self, bin_n):
+        low, high = self.bin_info.get_bin_range(bin_n)
+        return high - low
+
+    def get_title(self, title):
+        if self.slice_label:
+            return f"{title} {self.slice_label}"
+        return title
+
     def plot(self, kwdict):
+        # one set of plots along the first axis for every bin of the other axes
+        all_fits = (self.fit_df, self.best_fit_df, self.bootstrap_df)
+        for slice_bins in self.bin_info.get_slices():
+            self.slice_bins = slice_bins
+            self.slice_label = self.bin_info.get_label(slice_bins[0], axes=range(1, len(self.bin_info.axes)))
+            self.fit_df, self.best_fit_df, self.bootstrap_df = [df.loc[df['Bin'].isin(slice_bins)].copy() if df is not None else None for df in all_fits]
+            self.plot_slice(kwdict)
+        self.fit_df, self.best_fit_df, self.bootstrap_df = all_fits
+        self.slice_bins = list(range(self.nbins))
+        self.slice_label = ""
+
+    @abstractmethod
+    def plot_slice(self, kwdict):
         pass
@@ -17,11 +17,11 @@ class Plotter_Intensity(Plotter):
             kwdict["plot_density"] = input("Plot density on amplitude plots? (y/n)\n> ") == 'y'
         return kwdict
 
-    def plot(self, kwdict):
+    def plot_slice(self, kwdict):
         plt.rcParams["figure.figsize"] = (10 * len(self.waves), 20)
         plt.rcParams["font.size"] = 24
         self.spinner.start(f"Plotting Amplitudes for Bin 0")
-        for bin_num in range(len(self.bin_info_df)):
+        for bin_num in self.slice_bins:
             fig, axes = plt.subplots(nrows=2, ncols=len(self.waves))
             fits_in_bin_df = self.fits_in_bin[bin_num]
             for i, wave in enumerate(self.waves):
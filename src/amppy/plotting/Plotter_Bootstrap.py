@@ -47,14 +47,13 @@ class Plotter_Bootstrap(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title(Plotter.get_label_from_amplitude(amp) + " (Bootstrapped)")
+        plt.title(self.get_title(Plotter.get_label_from_amplitude(amp) + " (Bootstrapped)"))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
@@ -84,14 +83,13 @@ class Plotter_Bootstrap(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title(title + " (Bootstrapped)")
+        plt.title(self.get_title(title + " (Bootstrapped)"))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
@@ -103,7 +101,7 @@ class Plotter_Bootstrap(Plotter):
         self.pdf.savefig(fig, dpi=300)
         plt.close()
 
-    def plot(self, kwdict):
+    def plot_slice(self, kwdict):
         plt.rcParams["figure.figsize"] = (20, 10)
         plt.rcParams["font.size"] = 24
         if kwdict.get("acceptance_corrected"):
@@ -123,7 +121,7 @@ class Plotter_Bootstrap(Plotter):
         for amp in self.amplitudes + ["total"]:
             amp_bootstrap_error = []
             amp_bootstrap_value = []
-            for bin_n in range(len(self.bin_info_df)):
+            for bin_n in self.best_fit_df['Bin']:
                 bootstrap_bin_df = self.bootstrap_df.loc[self.bootstrap_df['Bin'] == bin_n]
                 amp_bootstrap_error.append(bootstrap_bin_df.loc[:, amp + tag].std())
                 amp_bootstrap_value.append(bootstrap_bin_df.loc[:, amp + tag].mean())
@@ -168,14 +166,13 @@ class Plotter_Bootstrap(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag + "_bootstrap"],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title("All Amplitudes (Bootstrapped)")
+        plt.title(self.get_title("All Amplitudes (Bootstrapped)"))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
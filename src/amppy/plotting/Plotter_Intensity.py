@@ -46,14 +46,13 @@ class Plotter_Intensity(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title(Plotter.get_label_from_amplitude(amp))
+        plt.title(self.get_title(Plotter.get_label_from_amplitude(amp)))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
@@ -83,14 +82,13 @@ class Plotter_Intensity(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title(title)
+        plt.title(self.get_title(title))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
@@ -103,7 +101,7 @@ class Plotter_Intensity(Plotter):
         plt.close()
 
 
-    def plot(self, kwdict):
+    def plot_slice(self, kwdict):
         plt.rcParams["figure.figsize"] = (20, 10)
         plt.rcParams["font.size"] = 24
         if kwdict.get("acceptance_corrected"):
@@ -151,14 +149,13 @@ class Plotter_Intensity(Plotter):
                         fmt='none',
                         color='k')
         plt.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-        plt.title("All Amplitudes")
+        plt.title(self.get_title("All Amplitudes"))
         plt.ylim(bottom=0)
         span = self.bin_edges[-1] - self.bin_edges[0]
         buf = span * 0.13
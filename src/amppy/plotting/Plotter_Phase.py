@@ -20,7 +20,7 @@ class Plotter_Phase(Plotter):
             kwdict["xlabel_invmass"] = f"m$({particles})$ GeV/$c^2$"
         return kwdict
 
-    def plot(self, kwdict):
+    def plot_slice(self, kwdict):
         plt.rcParams["figure.figsize"] = (20, 10)
         plt.rcParams["font.size"] = 24
         if kwdict.get("acceptance_corrected"):
@@ -48,14 +48,13 @@ class Plotter_Phase(Plotter):
                         fmt='none',
                         color='k')
             ax.hist(self.best_fit_df['Center'],
-                    bins=len(self.bin_info_df),
-                    range=(self.bin_edges[0], self.bin_edges[-1]),
+                    bins=self.bin_edges,
                     weights=self.best_fit_df['total' + tag],
                     fill=False,
                     histtype='step',
                     color='k',
                     label="Total")
-            plt.title(f"Phase Difference {phase}")
+            plt.title(self.get_title(f"Phase Difference {phase}"))
             plt.ylim(bottom=0)
             span = self.bin_edges[-1] - self.bin_edges[0]
             buf = span * 0.13
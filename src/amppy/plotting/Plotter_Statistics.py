@@ -28,9 +28,9 @@ class Plotter_Statistics(Plotter):
                     marker='.',
                     color='k',
                     label="Fit Minima")
-        plt.violinplot([df[amp + tag] for df in self.fits_in_bin],
+        plt.violinplot([self.fits_in_bin[bin_n][amp + tag] for bin_n in self.best_fit_df['Bin']],
                        self.best_fit_df['Center'],
-                       widths=self.bin_width,
+                       widths=[self.get_bin_width(bin_n) for bin_n in self.best_fit_df['Bin']],
                        showmeans=True,
                        showextrema=True,
                        showmedians=True)
@@ -39,7 +39,7 @@ class Plotter_Statistics(Plotter):
                     marker='o',
                     color='r',
                     label="Selected Minimum")
-        plt.title(title)
+        plt.title(self.get_title(title))
         if 'likelihood' in amp:
             plt.ylim(top=0)
         else:
@@ -54,7 +54,7 @@ class Plotter_Statistics(Plotter):
         self.pdf.savefig(fig, dpi=300)
         plt.close()
 
-    def plot(self, kwdict):
+    def plot_slice(self, kwdict):
         plt.rcParams["figure.figsize"] = (20, 10)
         plt.rcParams["font.size"] = 24
         if kwdict.get("acceptance_corrected"):
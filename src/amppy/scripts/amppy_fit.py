@@ -1,10 +1,47 @@
 #!/usr/bin/env python3
 import sys
+import os
+from multiprocessing import Pool
 from amppy.backends.Fitter import Fitter
+from amppy.backends.PythonMultiprocessing import run_pool
+from amppy.backends.NormInt import prepare_normints
 from pathlib import Path
 
+def read_tasks(task_file, task_id):
+    # lines of a task file written by the SLURM dispatcher are "<array task>\t<iteration>\t<seed>"
+    tasks = []
+    with open(task_file, 'r') as task_lines:
+        for line in task_lines:
+            task, iteration, seed = line.split()
+            if int(task) == task_id:
+                tasks.append((int(iteration), int(seed)))
+    return tasks
+
 if __name__ == "__main__":
-    f = Fitter()
-    f.setup(Path(str(sys.argv[1])), int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), str(sys.argv[5]), str(sys.argv[6]) == "True", Path(str(sys.argv[7])))
     # setup(self, bin_directory: Path, bin_number: int, iteration: int, seed: int, reaction: str, bootstrap: bool, config_template: Path)
-    f.fit()
+    # for job arrays, argv[3] is "array" and argv[4] is the task file indexed by SLURM_ARRAY_TASK_ID
+    # to precompute a bin's normalization integrals, argv[3] is "normint" and argv[4] is the bin config
+    # the optional argv[8] is "False" to integrate the MC in every fit even if the bin has shared integrals
+    bin_directory = Path(str(sys.argv[1]))
+    bin_number = int(sys.argv[2])
+    reaction = str(sys.argv[5])
+    bootstrap = str(sys.argv[6]) == "True"
+    config_template = Path(str(sys.argv[7]))
+    shared_normints = len(sys.argv) < 9 or str(sys.argv[8]) != "False"
+    if str(sys.argv[3]) == "normint":
+        prepare_normints(Path(str(sys.argv[4])))
+    elif str(sys.argv[3]) == "array":
+        # a bundle of fits shares this allocation, a single task whose cores the fits are spread over
+        tasks = read_tasks(Path(str(sys.argv[4])), int(os.environ["SLURM_ARRAY_TASK_ID"]))
+        processes = min(int(os.environ.get("SLURM_CPUS_PER_TASK", 1)), len(tasks))
+        input_tups = [(bin_directory, bin_number, iteration, seed, reaction, bootstrap, config_template, shared_normints) for iteration, seed in tasks]
+        if processes > 1:
+            with Pool(processes=processes) as pool:
+                pool.map(run_pool, input_tups)
+        else:
+            for tup in input_tups:
+                run_pool(tup)
+    else:
+        f = Fitter()
+        f.setup(bin_directory, bin_number, int(sys.argv[3]), int(sys.argv[4]), reaction, bootstrap, config_template, shared_normints)
+        f.fit()
@@ -11,6 +11,7 @@ import os
 import shutil
 import errno
 from datetime import datetime
+from amppy.utils import hadd_reduce
 
 def main():
     start_time = datetime.now()
@@ -19,7 +20,11 @@ def main():
     parser.add_argument("directory", help="the input directory containing ROOT files")
     parser.add_argument("-o", "--output", help="the output directory for the merged files")
     parser.add_argument("-f", "--format", help="format of ROOT input files, use # as a wildcard")
+    parser.add_argument("-j", "--processes", type=int, help="number of hadd jobs run at once; default is the number of cores")
+    parser.add_argument("--group-size", type=int, default=32, help="number of files merged by one hadd, larger sets are merged in parallel groups which are merged again afterwards")
     args = parser.parse_args()
+    if args.group_size < 2:
+        parser.error("--group-size must be at least 2")
 
     file_format = "*.root"
     if not args.format is None:
@@ -35,7 +40,7 @@ def main():
         raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(input_dir))
     if not output_dir.is_dir():
         raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(output_dir))
-    merge(input_dir, output_dir, file_format)
+    merge(input_dir, output_dir, file_format, args.processes, args.group_size)
     dselector = Path(args.dselector).resolve()
     if not dselector.suffix:
         dselector = Path(str(dselector) + ".C")
@@ -45,7 +50,7 @@ def main():
     print(f"Finished! Time Elapsed: {str(end_time-start_time)}")
 
 
-def merge(input_dir, output_dir, file_format):
+def merge(input_dir, output_dir, file_format, processes=None, group_size=32):
     db = rcdb.RCDBProvider("mysql://rcdb@hallddb.jlab.org/rcdb")
     input_files = list(input_dir.glob(file_format))
     input_run_numbers = []
@@ -118,16 +123,9 @@ def merge(input_dir, output_dir, file_format):
     print(f"Found {len(PERP_90_files)} 90 deg PERP files")
     print(f"Found {len(PARA_135_files)} 135 deg PARA files")
     print("Merging...")
-    print("Merging AMO...")
-    subprocess.run(['hadd', '-f', str(output_dir / f"tree_sum_AMO_{min_run_number}_{max_run_number}.root")] + [str(f) for f in AMO_files])
-    print("Merging PARA 0...")
-    subprocess.run(['hadd', '-f', str(output_dir / f"tree_sum_PARA_0_{min_run_number}_{max_run_number}.root")] + [str(f) for f in PARA_0_files])
-    print("Merging PERP 45...")
-    subprocess.run(['hadd', '-f', str(output_dir / f"tree_sum_PERP_45_{min_run_number}_{max_run_number}.root")] + [str(f) for f in PERP_45_files])
-    print("Merging PERP 90...")
-    subprocess.run(['hadd', '-f', str(output_dir / f"tree_sum_PERP_90_{min_run_number}_{max_run_number}.root")] + [str(f) for f in PERP_90_files])
-    print("Merging PARA 135...")
-    subprocess.run(['hadd', '-f', str(output_dir / f"tree_sum_PARA_135_{min_run_number}_{max_run_number}.root")] + [str(f) for f in PARA_135_files])
+    groups = {"AMO": AMO_files, "PARA_0": PARA_0_files, "PERP_45": PERP_45_files, "PERP_90": PERP_90_files, "PARA_135": PARA_135_files}
+    hadd_reduce({output_dir / f"tree_sum_{kind}_{min_run_number}_{max_run_number}.root": files for kind, files in groups.items()},
+                output_dir, processes, group_size)
     print("Merging Complete!")
 
 
@@ -0,0 +1,62 @@
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+import os
+import subprocess
+import tempfile
+
+def run_hadd(tup):
+    # thread pool worker, hadds input_files into output_path and reports the bytes read
+    target, output_path, input_files = tup
+    start_time = datetime.now()
+    result = subprocess.run(['hadd', '-f', str(output_path)] + [str(f) for f in input_files],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"hadd of {output_path.name} exited with code {result.returncode}:\n{result.stdout[-2000:]}")
+    n_bytes = sum([Path(f).stat().st_size for f in input_files])
+    return target, n_bytes, datetime.now() - start_time
+
+def hadd_reduce(targets, output_dir, processes=None, group_size=32):
+    # merges {output path: [input files]} as a tree reduction: every level hadds the remaining files of all
+    # targets group_size at a time in parallel, until a single hadd per target writes the output path
+    if processes == None:
+        processes = os.cpu_count()
+    remaining = {target: list(input_files) for target, input_files in targets.items() if input_files}
+    stats = {target: {"files": len(input_files), "hadds": 0, "bytes": 0, "elapsed": None} for target, input_files in remaining.items()}
+    start_time = datetime.now()
+    with tempfile.TemporaryDirectory(prefix="hadd_", dir=str(output_dir)) as tmp:
+        pool = ThreadPool(processes=max(1, processes))
+        try:
+            level = 0
+            while remaining:
+                tasks = []
+                next_remaining = {}
+                for target, input_files in remaining.items():
+                    if len(input_files) <= group_size:
+                        tasks.append((target, target, input_files))
+                        continue
+                    # parts are kept in order so the merged tree keeps the order of the runs
+                    for i, start in enumerate(range(0, len(input_files), group_size)):
+                        part_path = Path(tmp) / f"{target.stem}.level{level}.part{i}.root"
+                        next_remaining.setdefault(target, []).append(part_path)
+                        tasks.append((target, part_path, input_files[start:start + group_size]))
+                print(f"Level {level}: {len(tasks)} hadd(s) of {len(remaining)} file group(s) with {min(processes, len(tasks))} thread(s)...")
+                for target, n_bytes, elapsed in pool.imap_unordered(run_hadd, tasks):
+                    stats[target]["hadds"] += 1
+                    stats[target]["bytes"] += n_bytes
+                    if not target in next_remaining:
+                        # that was the target's final hadd
+                        stats[target]["elapsed"] = datetime.now() - start_time
+                # the previous level's parts are no longer needed
+                for input_files in remaining.values():
+                    for input_file in input_files:
+                        if Path(input_file).parent == Path(tmp):
+                            Path(input_file).unlink()
+                remaining = next_remaining
+                level += 1
+        finally:
+            # hadds already running can't be stopped, wait for them before the temporary directory is removed
+            pool.close()
+            pool.join()
+    for target, stat in stats.items():
+        print(f"\t{target.name}: {stat['files']} file(s), {round(stat['bytes'] / 1e9, 3)} GB read by {stat['hadds']} hadd(s), finished after {stat['elapsed']}")
@@ -0,0 +1,3 @@
+from __future__ import absolute_import
+
+from .Hadd import hadd_reduce, run_hadd
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# Writes gluex_tree.root, a small analysis tree in the GlueX DSelector layout (unsplit TClonesArrays of
+# TLorentzVector per combo, NumCombos, RFTime_Measured[NumCombos]) for the root_to_amptools regression test.
+# Needs PyROOT, run it from this directory.
+from array import array
+import ROOT
+
+N_EVENTS = 40
+PARTICLES = ["Proton__P4_KinFit", "PiPlus__P4_KinFit", "PiMinus__P4_KinFit", "KShort__P4_KinFit"]
+
+def main():
+    rng = ROOT.TRandom3(12345)
+    out_file = ROOT.TFile("gluex_tree.root", "RECREATE")
+    tree = ROOT.TTree("pippimks__B4_Tree", "pippimks__B4_Tree")
+    n_combos = array('I', [0])
+    rf_time = array('f', [0.0] * 8)
+    tree.Branch("NumCombos", n_combos, "NumCombos/i")
+    tree.Branch("RFTime_Measured", rf_time, "RFTime_Measured[NumCombos]/F")
+    x4_production = ROOT.TLorentzVector()
+    tree.Branch("X4_Production", x4_production, 32000, 0)
+    combo_arrays = {name: ROOT.TClonesArray("TLorentzVector", 8) for name in ["Beam__X4_Measured", "ComboBeam__X4_KinFit", "ComboBeam__P4_KinFit"] + PARTICLES}
+    for name, clones in combo_arrays.items():
+        tree.Branch(name, clones, 32000, 0)
+    for event in range(N_EVENTS):
+        n_combos[0] = 1 + event % 4
+        x4_production.SetXYZT(rng.Gaus(0, 0.1), rng.Gaus(0, 0.1), rng.Uniform(50, 80), rng.Gaus(0, 1))
+        for clones in combo_arrays.values():
+            clones.Clear()
+        # some arrays hold one more entry than NumCombos, which has to be ignored
+        n_entries = n_combos[0] + (1 if event % 5 == 0 else 0)
+        for combo in range(n_entries):
+            if combo < n_combos[0]:
+                rf_time[combo] = rng.Gaus(0, 6)
+            for name, clones in combo_arrays.items():
+                if name.endswith("X4_KinFit") or name.endswith("X4_Measured"):
+                    vector = ROOT.TLorentzVector(0.0, 0.0, rng.Uniform(50, 80), rng.Gaus(0, 6))
+                else:
+                    vector = ROOT.TLorentzVector(rng.Gaus(0, 0.3), rng.Gaus(0, 0.3), rng.Uniform(0.5, 8), 0.0)
+                    vector.SetE((vector.P()**2 + 0.25)**0.5)
+                clones.ConstructedAt(combo).__assign__(vector)
+        tree.Fill()
+    tree.Write()
+    out_file.Close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import re
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+uproot = pytest.importorskip("uproot")
+pytest.importorskip("awkward")
+pytest.importorskip("rcdb")
+hepunits = pytest.importorskip("hepunits")
+pytest.importorskip("particle")
+pytest.importorskip("amppy.utils")
+
+DATA_DIR = Path(__file__).parent / "data"
+GLUEX_TREE = DATA_DIR / "gluex_tree.root"
+SCRIPT = Path(__file__).parents[1] / "src" / "amppy" / "scripts" / "root_to_amptools"
+FINAL_STATE = [("Proton__P4_KinFit",), ("PiPlus__P4_KinFit", "PiMinus__P4_KinFit"), ("KShort__P4_KinFit",)]
+FLATTREE_BRANCHES = ["Weight", "E_Beam", "Px_Beam", "Py_Beam", "Pz_Beam", "NumFinalState",
+                     "E_FinalState", "Px_FinalState", "Py_FinalState", "Pz_FinalState"]
+
+
+@pytest.fixture(scope="module")
+def root_to_amptools():
+    loader = SourceFileLoader("root_to_amptools", str(SCRIPT))
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def convert_per_combo(input_tree, output_tree, final_state, weight=1):
+    # the per-combo loop root_to_amptools used before the conversion was vectorized, kept as the reference
+    n_acc_bins = -1
+    match = re.compile(r".*_B(\d).*").match(input_tree.name)
+    if match:
+        n_acc_bins = int(match.group(1))
+    final_state_flattened = [state for group in final_state for state in group]
+    keylist = ['NumCombos', 'RFTime_Measured', 'X4_Production', 'ComboBeam__X4_KinFit', 'ComboBeam__P4_KinFit'] + final_state_flattened
+    rows = {name: [] for name in FLATTREE_BRANCHES}
+    for batch in input_tree.iterate(keylist, step_size=5000, library='np'):
+        for event in [dict(zip(batch, t)) for t in zip(*batch.values())]:
+            final_state_vecs = [tuple([event[state] for state in group]) for group in final_state]
+            for combo_num in range(event['NumCombos']):
+                locBeamX4 = event['ComboBeam__X4_KinFit'][combo_num]
+                locBeamP4 = event['ComboBeam__P4_KinFit'][combo_num]
+                locBeamRFDeltaT = locBeamX4.member('fE') - (event['RFTime_Measured'][combo_num] + (locBeamX4.member('fP').member('fZ') - event['X4_Production'].member('fP').member('fZ')) / (hepunits.c_light * 0.1))
+                locAccidentalWeight = - 1 / (2 * n_acc_bins) if abs(locBeamRFDeltaT) > 0.5 * 4.008 else 1
+                rows["Weight"].append(locAccidentalWeight * weight)
+                rows["E_Beam"].append(locBeamP4.member('fE'))
+                rows["Px_Beam"].append(locBeamP4.member('fP').member('fX'))
+                rows["Py_Beam"].append(locBeamP4.member('fP').member('fY'))
+                rows["Pz_Beam"].append(locBeamP4.member('fP').member('fZ'))
+                rows["NumFinalState"].append(len(final_state))
+                rows["E_FinalState"].append([sum([p4[combo_num].member('fE') for p4 in group]) for group in final_state_vecs])
+                rows["Px_FinalState"].append([sum([p4[combo_num].member('fP').member('fX') for p4 in group]) for group in final_state_vecs])
+                rows["Py_FinalState"].append([sum([p4[combo_num].member('fP').member('fY') for p4 in group]) for group in final_state_vecs])
+                rows["Pz_FinalState"].append([sum([p4[combo_num].member('fP').member('fZ') for p4 in group]) for group in final_state_vecs])
+    output_tree.extend({name: np.array(values) for name, values in rows.items()})
+
+
+def read_flattree(path):
+    with uproot.open(str(path)) as root_file:
+        return root_file["kin"].arrays(FLATTREE_BRANCHES, library='np')
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory, root_to_amptools):
+    path = tmp_path_factory.mktemp("reference") / "flattree_reference.root"
+    with uproot.open(str(GLUEX_TREE)) as input_root_file:
+        input_tree = input_root_file[input_root_file.keys()[0]]
+        with uproot.recreate(str(path)) as output_root_file:
+            convert_per_combo(input_tree, root_to_amptools.create_flattree(output_root_file, len(FINAL_STATE)), FINAL_STATE, 0.5)
+    return read_flattree(path)
+
+
+def assert_same_flattree(flattree, reference):
+    # 40 events with 1 to 4 combos each, some of the TClonesArrays hold more entries than NumCombos
+    assert len(reference["Weight"]) == 100
+    assert np.any(reference["Weight"] < 0) and np.any(reference["Weight"] > 0)
+    for name in FLATTREE_BRANCHES:
+        assert flattree[name].dtype == reference[name].dtype, name
+        np.testing.assert_array_equal(flattree[name], reference[name], err_msg=name)
+
+
+def test_convert_tree_matches_per_combo_loop(tmp_path, root_to_amptools, reference):
+    path = tmp_path / "flattree.root"
+    with uproot.open(str(GLUEX_TREE)) as input_root_file:
+        input_tree = input_root_file[input_root_file.keys()[0]]
+        with uproot.recreate(str(path)) as output_root_file:
+            root_to_amptools.convert_tree(input_tree, root_to_amptools.create_flattree(output_root_file, len(FINAL_STATE)), FINAL_STATE, 0.5)
+    assert_same_flattree(read_flattree(path), reference)
+
+
+def test_split_conversion_matches_per_combo_loop(tmp_path, root_to_amptools, reference):
+    bounds = [0, 7, 7, 23, 40]
+    part_paths = []
+    for entry_start, entry_stop in zip(bounds[:-1], bounds[1:]):
+        part_path = tmp_path / f"flattree.part{len(part_paths)}.root"
+        root_to_amptools.convert_tree_range((GLUEX_TREE, part_path, FINAL_STATE, 0.5, False, entry_start, entry_stop))
+        part_paths.append(part_path)
+    root_to_amptools.concatenate_flattrees(part_paths, tmp_path / "flattree.root", len(FINAL_STATE))
+    assert_same_flattree(read_flattree(tmp_path / "flattree.root"), reference)